@@ -19,3 +19,11 @@ class BinArray(array):
       return array.__new__(BinArray, "B", data)
     else:
       return array.__new__(BinArray, "B")
+
+
+def tostring(data):
+  """Return the raw content of a BinArray, or of a read-only buffer on a
+  mapped file, as a string."""
+  if isinstance(data, buffer):
+    return str(data)
+  return data.tostring()
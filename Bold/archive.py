@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 2; mixedindent off; indent-mode python;
+
+# Copyright (C) 2009 Amand 'alrj' Tihon <amand.tihon@alrj.org>
+#
+# This file is part of bold, the Byte Optimized Linker.
+#
+# You can redistribute this file and/or modify it under the terms of the
+# GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License or (at your option) any later version.
+
+"""
+Static libraries (ar archives) support.
+"""
+
+from errors import *
+import mmap
+import struct
+
+ARMAG = "!<arch>\n"
+ARMAG_THIN = "!<thin>\n"
+
+
+def is_archive(path):
+  """Tell if the file at path is an ar archive."""
+  f = open(path, "rb")
+  magic = f.read(len(ARMAG))
+  f.close()
+  return magic in [ARMAG, ARMAG_THIN]
+
+
+class Archive(object):
+  """An ar archive, as produced by ar(1) in the GNU/SysV format.
+  Only its members headers and its symbol index are read at first. The
+  members themselves are loaded on demand, by load().
+
+  @ivar symbols: maps each symbol defined in the archive to the offset of
+    the member that defines it.
+  @ivar members: maps the offset of each member to its name, and the offset
+    and size of its content.
+  @ivar image: the whole archive, mapped if possible, that the members
+    loaded share.
+  """
+  header_format = "16s 12s 6s 6s 8s 10s 2s"
+  header_size = struct.calcsize(header_format)
+
+  def __init__(self, path):
+    object.__init__(self)
+    self.path = path
+    self.symbols = {}
+    self.members = {}
+    self.extracted = set()
+    self.fromfile(path)
+
+  def fromfile(self, path):
+    f = open(path, "rb")
+    try:
+      data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (mmap.error, ValueError):
+      data = f.read()
+    f.close()
+    self.image = data
+
+    magic = data[:len(ARMAG)]
+    if magic == ARMAG_THIN:
+      raise UnsupportedObject(path, "Thin archives are not supported")
+    if magic != ARMAG:
+      raise UnsupportedObject(path, "Not an ar archive")
+
+    index = None
+    longnames = ""
+    offset = len(ARMAG)
+    while offset + self.header_size <= len(data):
+      header = data[offset:offset + self.header_size]
+      t = struct.unpack(self.header_format, header)
+      name = t[0].rstrip(" ")
+      size = int(t[5])
+      start = offset + self.header_size
+
+      if name == "/":
+        index = (4, data[start:start + size])
+      elif name == "/SYM64/":
+        index = (8, data[start:start + size])
+      elif name == "//":
+        longnames = data[start:start + size]
+      else:
+        if name.startswith("/"):
+          # GNU long name, given as an offset in the "//" member
+          n = int(name[1:])
+          name = longnames[n:longnames.index("/\n", n)]
+        elif name.startswith("#1/"):
+          # BSD long name, stored at the beginning of the content
+          n = int(name[3:])
+          name = data[start:start + n].rstrip("\0")
+          start += n
+          size -= n
+        else:
+          name = name.rstrip("/")
+        self.members[offset] = (name, start, size)
+
+      # Members are aligned on 2 bytes
+      offset = start + size + (size & 1)
+
+    if index is None:
+      raise UnsupportedObject(path, "No symbol index (see ranlib)")
+    self._read_index(*index)
+
+  def _read_index(self, width, data):
+    """Read the symbol index, that lists the symbols defined by each member.
+    @param width: size of the numbers, 4 bytes for "/" or 8 for "/SYM64/".
+    """
+    fmt = {4: ">I", 8: ">Q"}[width]
+    count = struct.unpack_from(fmt, data)[0]
+    offsets = struct.unpack_from(">%d%s" % (count, fmt[1]), data, width)
+    names = data[width * (count + 1):].split("\0")
+    for name, offset in zip(names, offsets):
+      # The first member to define a symbol wins.
+      self.symbols.setdefault(name, offset)
+
+  def member_name(self, offset):
+    """Return the name of the member, as "archive(member)"."""
+    return "%s(%s)" % (self.path, self.members[offset][0])
+
+  def load(self, offset, elfclass):
+    """Parse the member at offset, which won't be given out again.
+    @param elfclass: the class to parse the member with, Elf64 or Elf32.
+    @return: the parsed object, with its symbols found.
+    """
+    self.extracted.add(offset)
+    name, start, size = self.members[offset]
+    obj = elfclass()
+    obj.filename = self.member_name(offset)
+    obj.fromfile(self.path, offset=start, image=self.image)
+    obj.resolve_names()
+    obj.find_symbols()
+    return obj
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# kate: space-indent on; indent-width 2; mixedindent off; indent-mode python;
+
+# Copyright (C) 2009 Amand 'alrj' Tihon <amand.tihon@alrj.org>
+#
+# This file is part of bold, the Byte Optimized Linker.
+#
+# You can redistribute this file and/or modify it under the terms of the
+# GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License or (at your option) any later version.
+
+"""
+On-disk cache of parsed objects.
+"""
+
+import cPickle
+import hashlib
+import os
+import tempfile
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+
+class ObjectCache(object):
+  """Keeps the summaries of parsed objects (see Elf64.summary()) on disk,
+  keyed by the content of the object file and the version of bold.
+  The least recently used entries are removed when the cache grows larger
+  than max_size bytes.
+
+  @ivar write_error: the error that prevented an entry from being written,
+    if any. Nothing is written to the cache after that.
+  """
+  suffix = ".bold-cache"
+  default_max_size = 256 * 1024 * 1024
+
+  def __init__(self, directory, max_size=None, version=""):
+    object.__init__(self)
+    self.directory = directory
+    if max_size is None:
+      max_size = self.default_max_size
+    self.max_size = max_size
+    self.version = version
+    self.hits = 0
+    self.misses = 0
+    self.write_error = None
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+    # Sizes and last use of the entries, to evict without listing the
+    # directory again and again.
+    self.entries = {}
+    for name in os.listdir(directory):
+      if name.endswith(self.suffix):
+        self._stat(os.path.join(directory, name))
+    self.trim()
+
+  def _stat(self, path):
+    try:
+      st = os.stat(path)
+    except OSError:
+      self.entries.pop(path, None)
+      return
+    self.entries[path] = (st.st_mtime, st.st_size)
+
+  def key(self, filename, kind):
+    """Compute the key of an object file.
+    @param filename: path to the object file
+    @param kind: what the file is parsed as, such as "Elf64"
+    @return: the key, as a string
+    """
+    h = hashlib.sha1()
+    # Summaries contain numpy arrays only when numpy is there.
+    h.update("%s\0%s\0%s\0" % (self.version, kind, numpy is not None))
+    f = open(filename, "rb")
+    try:
+      while True:
+        chunk = f.read(1 << 20)
+        if not chunk:
+          break
+        h.update(chunk)
+    finally:
+      f.close()
+    return h.hexdigest()
+
+  def _path(self, key):
+    return os.path.join(self.directory, key + self.suffix)
+
+  def get(self, key):
+    """Return the summary stored under key, or None."""
+    path = self._path(key)
+    try:
+      f = open(path, "rb")
+    except IOError:
+      self.misses += 1
+      return None
+    try:
+      try:
+        summary = cPickle.load(f)
+      finally:
+        f.close()
+    except Exception:
+      # Truncated or otherwise broken, forget about it.
+      self._remove(path)
+      self.misses += 1
+      return None
+    # Mark the entry as recently used
+    try:
+      os.utime(path, None)
+    except OSError:
+      pass
+    self._stat(path)
+    self.hits += 1
+    return summary
+
+  def put(self, key, summary):
+    """Store a summary under key, then evict the least recently used entries
+    if the cache is too large. If the entry can't be written, such as in a
+    full or read-only directory, the link goes on without the cache."""
+    if self.write_error is not None:
+      return
+    tmp = None
+    try:
+      fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+      f = os.fdopen(fd, "wb")
+      try:
+        cPickle.dump(summary, f, cPickle.HIGHEST_PROTOCOL)
+      finally:
+        f.close()
+      path = self._path(key)
+      # Atomic, a concurrent link never sees a partial entry.
+      os.rename(tmp, path)
+    except EnvironmentError, e:
+      self.write_error = e
+      if tmp is not None:
+        self._remove(tmp)
+      return
+    self._stat(path)
+    self.trim()
+
+  def _remove(self, path):
+    try:
+      os.unlink(path)
+    except OSError:
+      pass
+    self.entries.pop(path, None)
+
+  def trim(self):
+    """Remove the least recently used entries, until the cache fits in
+    max_size."""
+    total = sum(size for mtime, size in self.entries.itervalues())
+    if total <= self.max_size:
+      return
+    by_age = sorted(self.entries.iteritems(), key=lambda e: e[1][0])
+    for path, (mtime, size) in by_age:
+      if total <= self.max_size:
+        break
+      self._remove(path)
+      total -= size
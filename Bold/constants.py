@@ -17,9 +17,28 @@ class SymbolicConstant(long):
   _symbolics = {}
   _default = None
   def __new__(cls, value, symbolic=None):
+    self = long.__new__(cls, value)
     if symbolic:
       cls._symbolics[value] = symbolic
-    return long.__new__(cls, value)
+      cls._instances().setdefault(value, self)
+    return self
+
+  @classmethod
+  def _instances(cls):
+    # One table per subclass, created on first use.
+    if '_interned' not in cls.__dict__:
+      cls._interned = {}
+    return cls._interned
+
+  @classmethod
+  def get(cls, value):
+    """Return the shared instance for value, so that records decoded from
+    a file don't each carry their own copy of the same constant."""
+    interned = cls._instances()
+    try:
+      return interned[value]
+    except KeyError:
+      return interned.setdefault(value, cls(value))
 
   def __str__(self):
     if long(self) in self._symbolics:
@@ -76,6 +95,7 @@ EM_X86_64 = ElfMachine(62, "AMD x86-64 architecture")
 class ElfSectionIndex(SymbolicConstant):
   _symbolics = {}
 SHN_UNDEF = ElfSectionIndex(0, "UND")
+SHN_LORESERVE = ElfSectionIndex(0xff00, "LORESERVE")
 SHN_ABS = ElfSectionIndex(0xfff1, "ABS")
 SHN_COMMON = ElfSectionIndex(0xfff2, "COM")
 
@@ -93,6 +113,9 @@ SHT_NOBITS = ElfShType(8, "NOBITS")
 SHT_REL = ElfShType(9, "REL")
 SHT_SHLIB = ElfShType(10, "SHLIB")
 SHT_DYNSYM = ElfShType(11, "DYNSYM")
+SHT_GROUP = ElfShType(17, "GROUP")
+
+GRP_COMDAT = 0x1
 
 SHF_WRITE = 0x1
 SHF_ALLOC =             1 << 1
@@ -104,6 +127,7 @@ SHF_LINK_ORDER =        1 << 7
 SHF_OS_NONCONFORMING =  1 << 8
 SHF_GROUP =             1 << 9
 SHF_TLS =               1 << 10
+SHF_GNU_RETAIN =        1 << 21
 SHF_MASKOS =            0x0f00000
 SHF_MASKPROC =          0xf000000
 
@@ -217,6 +241,23 @@ R_X86_64_TLSLD = Amd64Relocation(20, "TLSLD")
 R_X86_64_DTPOFF32 = Amd64Relocation(21, "DTPOFF32")
 R_X86_64_GOTTPOFF = Amd64Relocation(22, "GOTTPOFF")
 R_X86_64_TPOFF32 = Amd64Relocation(23, "TPOFF32")
+R_X86_64_PC64 = Amd64Relocation(24, "PC64")
+R_X86_64_GOTOFF64 = Amd64Relocation(25, "GOTOFF64")
+R_X86_64_GOTPC32 = Amd64Relocation(26, "GOTPC32")
+R_X86_64_GOT64 = Amd64Relocation(27, "GOT64")
+R_X86_64_GOTPCREL64 = Amd64Relocation(28, "GOTPCREL64")
+R_X86_64_GOTPC64 = Amd64Relocation(29, "GOTPC64")
+R_X86_64_GOTPLT64 = Amd64Relocation(30, "GOTPLT64")
+R_X86_64_PLTOFF64 = Amd64Relocation(31, "PLTOFF64")
+R_X86_64_SIZE32 = Amd64Relocation(32, "SIZE32")
+R_X86_64_SIZE64 = Amd64Relocation(33, "SIZE64")
+R_X86_64_GOTPC32_TLSDESC = Amd64Relocation(34, "GOTPC32_TLSDESC")
+R_X86_64_TLSDESC_CALL = Amd64Relocation(35, "TLSDESC_CALL")
+R_X86_64_TLSDESC = Amd64Relocation(36, "TLSDESC")
+R_X86_64_IRELATIVE = Amd64Relocation(37, "IRELATIVE")
+R_X86_64_RELATIVE64 = Amd64Relocation(38, "RELATIVE64")
+R_X86_64_GOTPCRELX = Amd64Relocation(41, "GOTPCRELX")
+R_X86_64_REX_GOTPCRELX = Amd64Relocation(42, "REX_GOTPCRELX")
 
 class Intel386Relocation(SymbolicConstant):
   _symbolics = {}
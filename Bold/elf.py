@@ -10,27 +10,155 @@
 # either version 3 of the License or (at your option) any later version.
 
 
-from BinArray import BinArray
+from BinArray import BinArray, tostring
 from constants import *
 from errors import *
+import mmap
+import os
 import struct
 
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+try:
+  import resource
+except ImportError:
+  resource = None
+
 # Helpful decorator
 def nested_property(c):
   return property(**c())
 
+def decode_table(record, data, count):
+  """Decode count consecutive records from data, in one pass.
+  @param record: the record class, giving format, fields and dtype.
+  @return: a dict with a column of values for each of the record's fields.
+    The columns are numpy arrays if numpy is available, tuples otherwise.
+  """
+  if numpy is not None:
+    table = numpy.frombuffer(data, dtype=numpy.dtype(record.dtype), count=count)
+    return dict((name, table[name]) for name in record.fields)
+  t = struct.unpack_from(record.format[0] + record.format[1:] * count, data)
+  n = len(record.fields)
+  return dict((name, t[i::n]) for i, name in enumerate(record.fields))
+
+def tolist(column):
+  """Return a column of a decoded table as a list of python integers."""
+  if numpy is not None and isinstance(column, numpy.ndarray):
+    return column.tolist()
+  return list(column)
+
+def writable(column):
+  """Return a column of a decoded table that can be modified in place. The
+  numpy columns decoded from a mapped file are read-only, and the columns
+  are tuples without numpy."""
+  if numpy is not None and isinstance(column, numpy.ndarray):
+    if column.flags.writeable:
+      return column
+    return column.copy()
+  return list(column)
+
+def select(mask):
+  """Return the list of the indices where mask is set."""
+  if numpy is not None and isinstance(mask, numpy.ndarray):
+    return numpy.flatnonzero(mask).tolist()
+  return [i for i, m in enumerate(mask) if m]
+
+
+# Relocation formulas, with S the address of the symbol, A the addend and P
+# the address of the field to relocate.
+def absolute(S, A, P):
+  return S + A
+
+def pc_relative(S, A, P):
+  return S + A - P
+
+def relocation(format, formula, got=False):
+  """Describe a relocation type, for the relocations table of Elf classes.
+  @param format: struct format of the relocated field.
+  @param formula: computes the value of the field, absolute or pc_relative.
+  @param got: the symbol is reached through its GOT slot, whose address is
+    then used as S (see Elf.allocate_got()).
+  @return: the codec of the field, the signed codec to read an implicit
+    addend from the field, the formula and the got flag.
+  """
+  return (struct.Struct(format), struct.Struct(format.lower()), formula, got)
+
+
+# Multi-byte NOPs, as recommended by Intel, to pad code.
+nops = [
+  "",
+  "\x90",
+  "\x66\x90",
+  "\x0f\x1f\x00",
+  "\x0f\x1f\x40\x00",
+  "\x0f\x1f\x44\x00\x00",
+  "\x66\x0f\x1f\x44\x00\x00",
+  "\x0f\x1f\x80\x00\x00\x00\x00",
+  "\x0f\x1f\x84\x00\x00\x00\x00\x00",
+  "\x66\x0f\x1f\x84\x00\x00\x00\x00\x00",
+]
+
+def padding(size, code=False):
+  """Return size bytes of padding, NOPs for code, zeros otherwise."""
+  if not code:
+    return "\0" * size
+  return nops[-1] * (size / (len(nops) - 1)) + nops[size % (len(nops) - 1)]
+
+def alignment(content):
+  """Return the alignment that a part of a segment needs, and if it's
+  code."""
+  return (getattr(content, 'alignment', 1), getattr(content, 'code', False))
+
+
+class Record(type):
+  """Metaclass of the ELF records. The struct format of each record class is
+  compiled once, into its codec, and gives the size of the record."""
+  def __init__(cls, name, bases, attributes):
+    type.__init__(cls, name, bases, attributes)
+    if 'format' in attributes:
+      cls.codec = struct.Struct(cls.format)
+      cls.size = cls.codec.size
+      cls.physical_size = cls.size
+      cls.logical_size = cls.size
+
 
 #--------------------------------------------------------------------------
 #  Elf
 #--------------------------------------------------------------------------
 
-class Elf64(object):
-  """Handles an Elf64 object."""
-  interpreter = "/lib64/ld-linux-x86-64.so.2"
-
-  def __init__(self, path=None):
+class Elf(object):
+  """Handles an Elf object. This class doesn't depend on the ELF class (32
+  or 64 bits) nor on the machine, see Elf64 and Elf32 for these.
+
+  @cvar elfclass: the ELF class of the objects, ELFCLASS32 or ELFCLASS64.
+  @cvar machine: the machine of the objects.
+  @cvar relocations: maps each supported relocation type to how it is
+    applied, see relocation().
+  @cvar min_batch: relocation tables with fewer entries are not worth
+    applying with numpy.
+  @cvar got_entry: codec of the GOT slots, None if the GOT relocations are
+    not supported.
+  @cvar relaxed_relocation: what a GOT relocation becomes once relaxed.
+  @cvar branch_relocations: the relocation types that a direct call or jump
+    uses.
+  @cvar min_mapped_size: smaller files are read rather than mapped. Mapping
+    them would not save much, and each mapping holds a file descriptor until
+    the end of the link.
+  @cvar mappings: how many files are mapped, see max_mappings().
+  """
+  min_batch = 64
+  got_entry = None
+  relaxed_relocation = None
+  branch_relocations = ()
+  min_mapped_size = 1 << 20
+  mappings = 0
+
+  def __init__(self, path=None, mapped=True, all_sections=False):
     object.__init__(self)
-    self.header = Elf64_Ehdr()
+    self.header = self.Ehdr()
     self.header.owner = self
     self.shdrs = []
     self.phdrs = []
@@ -41,50 +169,133 @@ class Elf64(object):
     self.global_symbols = {}
     self.undefined_symbols = []
     self.common_symbols = []
+    self.skipped_bytes = 0
+    self.skipped_relocations = 0
+    self.applied_relocations = 0
+    self.relaxed_loads = 0
+    self.import_loads = 0
+    self.got = None
+    # Sections left out by the garbage collection or folded into another
+    self.discarded = set()
+    # The folded sections, with the one that replaces them
+    self.folded = {}
 
     if path:
       self.filename = path
-      self.fromfile(path)
+      self.fromfile(path, mapped, all_sections)
 
   # Functions for relocatables files used as input
 
-  def fromfile(self, path):
+  @staticmethod
+  def max_mappings():
+    """Tell how many files may be mapped at once: a quarter of the file
+    descriptors that the process may open, the rest being left to the
+    files read and to the libraries."""
+    if resource is None:
+      return 256
+    limit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+    if limit == resource.RLIM_INFINITY:
+      return 1024
+    return limit // 4
+
+  def fromfile(self, path, mapped=True, all_sections=False, tables=None,
+      offset=0, image=None):
+    """Load a relocatable object file.
+    @param mapped: map the file in memory. The sections content will then be
+      read-only buffers on the mapping instead of copies, and will only get
+      copied when they are actually modified by the relocation.
+    @param all_sections: also load the content of the sections that will not
+      be part of the executable (debug info, comments, notes...) and of their
+      relocation tables. By default, only their header is loaded.
+    @param tables: the already decoded symbol and relocation tables, as
+      returned by summary(), indexed by section.
+    @param offset: where the object starts in the file, for archive members.
+    @param image: the whole file, already mapped or read, such as an archive
+      shared by its members.
+    """
+    if tables is None:
+      tables = {}
+    self.base = offset
     f = file(path, "rb")
+    self.image = image
+    if (image is None and mapped and Elf.mappings < Elf.max_mappings() and
+        os.fstat(f.fileno()).st_size >= self.min_mapped_size):
+      try:
+        self.image = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        Elf.mappings += 1
+      except (mmap.error, ValueError):
+        # Special files can't be mapped, simply read them.
+        pass
 
     # Load Elf header
-    data = BinArray()
-    data.fromfile(f, Elf64_Ehdr.size)
-    self.header.fromBinArray(data)
+    self.header.fromBinArray(self._read(f, 0, self.Ehdr.size))
 
     # This linker only supports relocatable objects
     if self.header.e_type != ET_REL:
       raise NotRelocatableObject(path)
 
-    if self.header.e_ident.ei_class != ELFCLASS64:
-      raise UnsupportedObject(path, "Not %s" % ELFCLASS64)
+    if self.header.e_ident.ei_class != self.elfclass:
+      raise UnsupportedObject(path, "Not %s" % self.elfclass)
 
-    if self.header.e_machine != EM_X86_64:
-      raise UnsupportedObject(path, "Not %s" % EM_X86_64)
+    if self.header.e_machine != self.machine:
+      raise UnsupportedObject(path, "Not %s" % self.machine)
 
-    # Load sections headers
-    f.seek(self.header.e_shoff)
+    # Load sections headers, all in one read
+    shentsize = self.header.e_shentsize
+    data = self._read(f, self.header.e_shoff, self.header.e_shnum * shentsize)
     for i in range(self.header.e_shnum):
-      data = BinArray()
-      data.fromfile(f, self.header.e_shentsize)
-      h = Elf64_Shdr(i, data)
+      h = self.Shdr(i, data, i * shentsize)
       h.owner = self
       self.shdrs.append(h)
 
     # Read sections content
     for sh in self.shdrs:
-      data = BinArray()
-      if sh.sh_type != SHT_NOBITS:
-        f.seek(sh.sh_offset)
-        data.fromfile(f, sh.sh_size)
-      sh.content = data
+      needed = self.is_needed(sh)
+      if not needed:
+        # Neither emitted nor applied
+        if sh.sh_type in [SHT_REL, SHT_RELA] and sh.sh_entsize:
+          self.skipped_relocations += sh.sh_size / sh.sh_entsize
+        if sh.sh_type != SHT_NOBITS:
+          self.skipped_bytes += sh.sh_size
+      if not (all_sections or needed):
+        # Keep the header, but don't bother with the content
+        sh.content = BinArray()
+      elif sh.index in tables:
+        data = self._read(f, sh.sh_offset, sh.sh_size)
+        sh.restore_content(data, tables[sh.index])
+      elif sh.sh_type != SHT_NOBITS:
+        sh.content = self._read(f, sh.sh_offset, sh.sh_size)
+      else:
+        sh.content = BinArray()
 
     f.close()
 
+  def is_needed(self, sh):
+    """Tell if the content of a section is needed to produce the executable.
+    Only ALLOC sections are emitted, along with the relocation tables that
+    apply to them, and the symbol and string tables are needed to link."""
+    if sh.sh_type in [SHT_SYMTAB, SHT_STRTAB, SHT_GROUP]:
+      return True
+    if sh.sh_type in [SHT_REL, SHT_RELA]:
+      return bool(self.shdrs[sh.sh_info].sh_flags & SHF_ALLOC)
+    return bool(sh.sh_flags & SHF_ALLOC)
+
+  def is_emitted(self, sh):
+    """Tell if a section will be part of the executable: the ALLOC sections
+    that were not discarded."""
+    return bool(sh.sh_flags & SHF_ALLOC) and sh not in self.discarded
+
+  def _read(self, f, offset, size):
+    """Return size bytes at offset, either as a buffer on the mapped file or
+    as a BinArray read from f."""
+    offset += self.base
+    if self.image is not None:
+      return buffer(self.image, offset, size)
+    data = BinArray()
+    f.seek(offset)
+    data.fromfile(f, size)
+    return data
+
   def resolve_names(self):
     # The .shstrtab index is in Elf Header. find the sections names
     strtab = self.shdrs[self.header.e_shstrndx].content
@@ -93,94 +304,342 @@ class Elf64(object):
       sh.name = strtab[int(sh.sh_name)]
       self.sections[sh.name] = sh
 
-      # And resolve names in the section itself
+    # And resolve names in the sections themselves, which may need the names
+    # of the other sections.
+    for sh in self.shdrs:
       sh.resolve_names()
 
 
   def find_symbols(self):
     for sh in self.shdrs:
       if sh.sh_type == SHT_SYMTAB:
-        symtab = sh.content.symtab
-
-        for symbol in symtab:
-          if symbol.st_type == STT_FILE:
-            continue
-          if symbol.st_shndx == SHN_ABS:
-            continue
-          if symbol.st_shndx == SHN_COMMON:
-            if symbol.name:
-              sym = (symbol.name, symbol.st_size, symbol.st_value)
-              self.common_symbols.append(sym)
-              continue
-          if symbol.st_shndx == SHN_UNDEF:
-            if symbol.name:
-              self.undefined_symbols.append(symbol.name)
-            continue
-
-          target_section = self.shdrs[symbol.st_shndx]
-
-          symbol_name = symbol.name
-          value = symbol.st_value
-          bind = symbol.st_binding
+        symtab = sh.content
+        names = symtab.names
+
+        for i in select(symtab.common_mask):
+          if names[i]:
+            sym = (names[i], int(symtab.st_size[i]), int(symtab.st_value[i]))
+            self.common_symbols.append(sym)
+
+        for i in select(symtab.undefined_mask):
+          if names[i]:
+            self.undefined_symbols.append(names[i])
+
+        for i in select(symtab.defined_mask):
+          target_section = self.shdrs[int(symtab.st_shndx[i])]
+
+          symbol_name = names[i]
+          value = int(symtab.st_value[i])
 
           # We got a name, a target section, and an offset in the section
-          if symbol.st_binding == STB_LOCAL:
-            if symbol.st_type == STT_SECTION:
+          if symtab.local_mask[i]:
+            if symtab.st_info[i] & 0x0f == STT_SECTION:
               symbol_name = target_section.name
             self.local_symbols[symbol_name] = (target_section, value)
           else:
             self.global_symbols[symbol_name] = (target_section, value)
 
-  def apply_relocation(self, all_global_symbols):
-    # find relocation tables
-    relocations = [sh for sh in self.shdrs if sh.sh_type in [SHT_REL, SHT_RELA]]
-    for sh in relocations:
-      target = sh.target.content
-
-      for reloc in sh.content.relatab:
-        if reloc.symbol.st_shndx in [SHN_UNDEF, SHN_COMMON]:
-          # This is an extern or common symbol, find it in all_global_symbols
-          sym_address = all_global_symbols[reloc.symbol.name]
+  def summary(self):
+    """Return what was decoded and found out about this object, after
+    resolve_names() and find_symbols(), as a compact and picklable dict.
+    The object can be rebuilt from it with restore(), without decoding its
+    tables again."""
+    def by_index(symbols):
+      return [(name, section.index, value)
+        for name, (section, value) in symbols.iteritems()]
+    tables = {}
+    for sh in self.shdrs:
+      if sh.sh_type in [SHT_SYMTAB, SHT_REL, SHT_RELA]:
+        tables[sh.index] = sh.content.summary()
+    return {
+      'tables': tables,
+      'local_symbols': by_index(self.local_symbols),
+      'global_symbols': by_index(self.global_symbols),
+      'undefined_symbols': self.undefined_symbols,
+      'common_symbols': self.common_symbols,
+    }
+
+  def restore(self, path, summary, mapped=True):
+    """Load an object whose summary() is already known. This replaces the
+    calls to fromfile(), resolve_names() and find_symbols()."""
+    self.filename = path
+    self.fromfile(path, mapped, tables=summary['tables'])
+    self.resolve_names()
+    for name, index, value in summary['local_symbols']:
+      self.local_symbols[name] = (self.shdrs[index], value)
+    for name, index, value in summary['global_symbols']:
+      self.global_symbols[name] = (self.shdrs[index], value)
+    self.undefined_symbols = list(summary['undefined_symbols'])
+    self.common_symbols = list(summary['common_symbols'])
+
+  def resolve_addresses(self, all_global_symbols):
+    """Find out the final address of the symbols used by the relocations,
+    once the layout is done, so that they can be looked up by index.
+    Each symtab gets an addresses list, with None for the symbols that have
+    no address, and with numpy, the same as the address_vector and resolved
+    arrays.
+    @param all_global_symbols: the final address of each global symbol.
+    """
+    # Where each section ended up, if anywhere.
+    bases = [getattr(s.content, 'virt_addr', None) for s in self.shdrs]
+    if self.got is not None:
+      got_data = self.got.content.writable_data()
+    for sh in self.shdrs:
+      if sh.sh_type not in [SHT_REL, SHT_RELA]:
+        continue
+      if not self.is_emitted(sh.target):
+        continue
+      symtab = sh.content.symtab
+      if symtab.addresses is not None:
+        continue
+
+      addresses = []
+      for name, shndx, value, info in zip(symtab.names,
+          tolist(symtab.st_shndx), tolist(symtab.st_value),
+          tolist(symtab.st_info)):
+        if shndx in [SHN_UNDEF, SHN_COMMON]:
+          # An extern or common symbol, found in all_global_symbols
+          addresses.append(all_global_symbols.get(name))
+        elif shndx == SHN_ABS:
+          addresses.append(value)
+        elif shndx >= len(bases):
+          addresses.append(None)
+        elif info >> 4 != STB_LOCAL and self.shdrs[shndx] in self.discarded:
+          # Defined in a discarded COMDAT group, the kept one is used.
+          addresses.append(all_global_symbols.get(name))
+        elif bases[shndx] is not None:
+          # Possibly a discarded section, where its replacement is
+          addresses.append(bases[shndx] + value)
+        elif self.shdrs[shndx] in self.discarded:
+          # Local to a discarded section that nothing replaces, only
+          # referred to from the likes of .eh_frame: a tombstone value.
+          addresses.append(0)
         else:
-          # source == in which section it is defined
-          source = self.shdrs[reloc.symbol.st_shndx].content
-          sym_address = source.virt_addr + reloc.symbol.st_value
-
-        target_ba = target.data # The actual BinArray that we'll modify
-        pc_address = target.virt_addr + reloc.r_offset
-
-        if reloc.r_type == R_X86_64_64:
-          format = "<Q" # Direct 64 bit address
-          target_value = sym_address + reloc.r_addend
-        elif reloc.r_type == R_X86_64_PC32:
-          format = "<i" # PC relative 32 bit signed
-          target_value = sym_address + reloc.r_addend - pc_address
-        elif reloc.r_type == R_X86_64_32:
-          format = "<I" # Direct 32 bit zero extended
-          target_value = sym_address + reloc.r_addend
-        elif reloc.r_type == R_X86_64_32S:
-          format = "<i" # Direct 32 bit sign extended
-          target_value = sym_address + reloc.r_addend
-        elif reloc.r_type == R_X86_64_PC16:
-          format = "<h" # 16 bit sign extended pc relative
-          target_value = sym_address + reloc.r_addend - pc_address
-        elif reloc.r_type == R_X86_64_16:
-          format = "<H" # Direct 16 bit zero extended
-          target_value = sym_address + reloc.r_addend
-        elif reloc.r_type == R_X86_64_PC8:
-          format = "b" # 8 bit sign extended pc relative
-          target_value = sym_address + reloc.r_addend - pc_address
-        elif reloc.r_type == R_X86_64_8:
-          format = "b" # Direct 8 bit sign extended
-          target_value = sym_address + reloc.r_addend
+          addresses.append(None)
+      symtab.addresses = addresses
+
+      # The addresses of the GOT slots, see allocate_got()
+      got = [None] * len(addresses)
+      for r_sym, slot in symtab.got_slots.iteritems():
+        name = symtab.names[r_sym]
+        if slot is None:
+          # An import, its slot is the pointer filled by the runtime
+          got[r_sym] = all_global_symbols.get("_bold__%s" % name)
+          continue
+        if addresses[r_sym] is None:
+          raise UndefinedSymbol(name)
+        self.got_entry.pack_into(got_data, slot, addresses[r_sym])
+        got[r_sym] = bases[self.got.index] + slot
+      symtab.got_addresses = got
+
+      if numpy is not None:
+        symtab.resolved = numpy.array([a is not None for a in addresses],
+          dtype=bool)
+        symtab.address_vector = numpy.array([a or 0 for a in addresses],
+          dtype=numpy.int64)
+        symtab.got_resolved = numpy.array([a is not None for a in got],
+          dtype=bool)
+        symtab.got_vector = numpy.array([a or 0 for a in got],
+          dtype=numpy.int64)
+
+  def apply_relocation(self, all_global_symbols):
+    self.resolve_addresses(all_global_symbols)
+    for target, tables in self.relocation_targets():
+      self.relocate_section(target, tables)
+
+  def relocation_targets(self):
+    """Group the relocation tables by the section they apply to. The
+    sections that are not emitted don't need to be relocated, and are left
+    out.
+    @return: a list of (section header, relocation tables), in the order of
+      the tables.
+    """
+    targets = []
+    tables = {}
+    for sh in self.shdrs:
+      if sh.sh_type not in [SHT_REL, SHT_RELA]:
+        continue
+      if not self.is_emitted(sh.target):
+        continue
+      if sh.target not in tables:
+        tables[sh.target] = []
+        targets.append((sh.target, tables[sh.target]))
+      tables[sh.target].append(sh.content)
+    return targets
+
+  def allocate_got(self, imports):
+    """Deal with the relocations that go through the GOT, before the layout.
+    The loads of the symbols defined in the executable are relaxed into
+    direct references where the instruction allows it, see relax(). The
+    imports use the pointer that the runtime fills, _bold__<name>, as their
+    GOT slot. Only the remaining symbols get a slot, in a .got section added
+    to this object.
+    @param imports: the names of the symbols resolved at runtime.
+    """
+    types = [r for r, (codec, signed, formula, got)
+      in self.relocations.iteritems() if got]
+    if not types:
+      return
+    slots = 0
+    for target, tables in self.relocation_targets():
+      for relatab in tables:
+        if numpy is not None and isinstance(relatab.r_type, numpy.ndarray):
+          mask = numpy.in1d(relatab.r_type, types)
         else:
-          print "Unsupported relocation type: %s" % reloc.r_type
-          exit(1)
+          mask = [r in types for r in relatab.r_type]
+        symtab = relatab.symtab
+        for n in select(mask):
+          r_sym = int(relatab.r_sym[n])
+          name = symtab.names[r_sym]
+          if symtab.st_shndx[r_sym] == SHN_UNDEF and name in imports:
+            symtab.got_slots[r_sym] = None
+            self.import_loads += 1
+          elif self.relax(target.content.writable_data(),
+              int(relatab.r_offset[n]), int(relatab.r_type[n])):
+            relatab.r_type[n] = self.relaxed_relocation
+            self.relaxed_loads += 1
+          elif r_sym not in symtab.got_slots:
+            symtab.got_slots[r_sym] = slots * self.got_entry.size
+            slots += 1
+
+    if slots:
+      self.got = self.Shdr(len(self.shdrs))
+      self.got.owner = self
+      self.got.name = ".got"
+      self.got.sh_type = SHT_PROGBITS
+      self.got.sh_flags = (SHF_WRITE | SHF_ALLOC)
+      self.got.sh_size = slots * self.got_entry.size
+      self.got.sh_addralign = self.got_entry.size
+      self.got.content = BinArray("\0" * self.got.sh_size)
+      self.shdrs.append(self.got)
+      self.sections[".got"] = self.got
+
+  def relax(self, data, offset, r_type):
+    """Rewrite the instruction of a GOT relocation so that it uses the
+    symbol directly, when the machine allows it.
+    @param data: the content of the section, as a BinArray.
+    @param offset: the offset of the relocated field in data.
+    @return: True if the instruction was rewritten.
+    """
+    return False
+
+  def is_branch(self, data, offset, r_type):
+    """Tell if a relocation is the target of a direct call or jump, rather
+    than something that takes the address of the symbol.
+    @param data: the content of the relocated section, as a string.
+    @param offset: the offset of the relocated field in data.
+    """
+    if r_type not in self.branch_relocations or offset < 1:
+      return False
+    opcode = ord(data[offset - 1])
+    if opcode in [0xe8, 0xe9]:
+      # call or jmp rel32
+      return True
+    # jcc rel32
+    return offset >= 2 and data[offset - 2] == '\x0f' and 0x80 <= opcode <= 0x8f
+
+  def supports(self, relatab):
+    """Tell if all the relocation types used in relatab are supported."""
+    return set(tolist(relatab.r_type)).issubset(self.relocations)
+
+  def relocate_section(self, target, tables):
+    """Apply relocation tables to a section.
+    @param target: the header of the section.
+    @param tables: the relocation tables that apply to it.
+    """
+    for relatab in tables:
+      if (numpy is None or len(relatab) < self.min_batch or
+          not self.relocate_batch(relatab, target.content)):
+        self.relocate(relatab, target.content)
+      self.applied_relocations += len(relatab)
+
+  def relocate(self, relatab, target):
+    """Apply the entries of a relocation table to its target, one by one."""
+    target_ba = target.writable_data() # The BinArray that we'll modify
+    symtab = relatab.symtab
+    addresses = symtab.addresses
+    got_addresses = symtab.got_addresses
+    if relatab.r_addend is None:
+      # SHT_REL, the addends are stored in the fields to relocate
+      addends = [None] * len(relatab)
+    else:
+      addends = tolist(relatab.r_addend)
+
+    for r_offset, r_type, r_sym, r_addend in zip(tolist(relatab.r_offset),
+        tolist(relatab.r_type), tolist(relatab.r_sym), addends):
+      if r_type not in self.relocations:
+        print "Unsupported relocation type: %s" % self.relocation_type(r_type)
+        exit(1)
+      codec, signed, formula, got = self.relocations[r_type]
+
+      if got:
+        sym_address = got_addresses[r_sym]
+      else:
+        sym_address = addresses[r_sym]
+      if sym_address is None:
+        raise UndefinedSymbol(symtab.names[r_sym])
+
+      if r_addend is None:
+        # Implicit addends are read as signed values, whatever the field.
+        r_addend = signed.unpack_from(target_ba, r_offset)[0]
+
+      pc_address = target.virt_addr + r_offset
+      codec.pack_into(target_ba, r_offset,
+        formula(sym_address, r_addend, pc_address))
+
+  def relocate_batch(self, relatab, target):
+    """Apply a relocation table with numpy, computing the values of all the
+    entries of a same type at once. The result is the same as relocate()'s.
+    @return: False if the table can't be applied that way, because of an
+      unsupported type, of a symbol without address or of a value that
+      doesn't fit in its field. Nothing is changed then, and relocate() will
+      report the problem.
+    """
+    symtab = relatab.symtab
+    r_offset = numpy.asarray(relatab.r_offset, dtype=numpy.int64)
+    r_type = numpy.asarray(relatab.r_type)
+    r_sym = numpy.asarray(relatab.r_sym)
+    types = numpy.unique(r_type).tolist()
+    if [r for r in types if r not in self.relocations]:
+      return False
+
+    image = numpy.frombuffer(target.writable_data(), dtype=numpy.uint8)
+    # Compute everything before writing anything, so that a table can still
+    # be given up.
+    writes = []
+    for r in types:
+      codec, signed, formula, got = self.relocations[r]
+      group = numpy.flatnonzero(r_type == r)
+      if got:
+        resolved, addresses = symtab.got_resolved, symtab.got_vector
+      else:
+        resolved, addresses = symtab.resolved, symtab.address_vector
+      if not resolved[r_sym[group]].all():
+        return False
+      offsets = r_offset[group]
+      # The indices of the bytes of each field, one field per row
+      fields = offsets[:, numpy.newaxis] + numpy.arange(codec.size)
+      if relatab.r_addend is None:
+        # Implicit addends are read as signed values, whatever the field.
+        field_type = numpy.dtype(signed.format)
+        addends = image[fields].view(field_type).ravel().astype(numpy.int64)
+      else:
+        addends = numpy.asarray(relatab.r_addend, dtype=numpy.int64)[group]
+      if abs(addends).max() >= 1 << 62:
+        # Might overflow, which python integers never do.
+        return False
 
-        d = BinArray(struct.pack(format, target_value))
-        start = reloc.r_offset
-        end = start + len(d)
-        target_ba[start:end] = d
+      values = formula(addresses[r_sym[group]], addends,
+        target.virt_addr + offsets)
+      field_type = numpy.dtype(codec.format)
+      limits = numpy.iinfo(field_type)
+      if values.min() < limits.min or values.max() > limits.max:
+        return False
+      writes.append((fields, values.astype(field_type)))
+
+    for fields, values in writes:
+      image[fields] = values.view(numpy.uint8).reshape(fields.shape)
+    return True
 
 
   # Functions for executables files, as output
@@ -219,12 +678,10 @@ class Elf64(object):
 #  Elf file header
 #--------------------------------------------------------------------------
 
-class Elf64_eident(object):
+class Elf_eident(object):
   """Detailed representation for the Elf identifier."""
+  __metaclass__ = Record
   format = "16B"
-  size = struct.calcsize(format)
-  physical_size = size
-  logical_size = size
 
   def __init__(self, rawdata=None):
     object.__init__(self)
@@ -232,18 +689,18 @@ class Elf64_eident(object):
       self.fromBinArray(rawdata)
 
   def fromBinArray(self, rawdata):
-    t = struct.unpack(self.format, rawdata)
     self.ei_magic = rawdata[:4]
-    self.ei_class = ElfClass(rawdata[4])
-    self.ei_data = ElfData(rawdata[5])
-    self.ei_version = ElfVersion(rawdata[6])
-    self.ei_osabi = ElfOsAbi(rawdata[7])
+    self.ei_class = ElfClass.get(rawdata[4])
+    self.ei_data = ElfData.get(rawdata[5])
+    self.ei_version = ElfVersion.get(rawdata[6])
+    self.ei_osabi = ElfOsAbi.get(rawdata[7])
     self.ei_abiversion = 0
     self.ei_pad = [0, 0, 0, 0, 0, 0, 0]
 
-  def make_default_amd64(self):
+  def make_default(self, elfclass):
+    """Identify a little endian executable of the given ELF class."""
     self.ei_magic = BinArray([0x7f, 0x45, 0x4c, 0x46])
-    self.ei_class = ELFCLASS64
+    self.ei_class = elfclass
     self.ei_data = ELFDATA2LSB
     self.ei_version = EV_CURRENT
     self.ei_osabi = ELFOSABI_SYSV
@@ -261,38 +718,36 @@ class Elf64_eident(object):
     return ba
 
 
-class Elf64_Ehdr(object):
-  """Elf file header"""
-  format = "<16B 2H I 3Q I 6H"
-  size = struct.calcsize(format)
-  physical_size = size
-  logical_size = size
-  
+class Elf_Ehdr(object):
+  """Elf file header. Subclasses give the format, the machine and the types
+  of the program and section headers."""
+  __metaclass__ = Record
+
   def __init__(self, rawdata=None):
     object.__init__(self)
-    self.e_ident = Elf64_eident()
+    self.e_ident = Elf_eident()
     self.e_type = ET_NONE
-    self.e_machine = EM_X86_64
+    self.e_machine = self.machine
     self.e_version = EV_CURRENT
     self.e_entry = 0
     self.e_phoff = 0
     self.e_shoff = 0
     self.e_flags = 0
     self.e_ehsize = self.size
-    self.e_phentsize = Elf64_Phdr.size
+    self.e_phentsize = self.Phdr.size
     self.e_phnum = 0
-    self.e_shentsize = Elf64_Shdr.size
+    self.e_shentsize = self.Shdr.size
     self.e_shnum = 0
     self.e_shstrndx = 0
     if rawdata is not None:
       self.fromBinArray(rawdata)
 
   def fromBinArray(self, rawdata):
-    t = struct.unpack(self.format, rawdata)
-    self.e_ident = Elf64_eident(BinArray(rawdata[:16]))
-    self.e_type = ElfType(t[16])
-    self.e_machine = ElfMachine(t[17])
-    self.e_version = ElfVersion(t[18])
+    t = self.codec.unpack_from(rawdata)
+    self.e_ident = Elf_eident(BinArray(rawdata[:16]))
+    self.e_type = ElfType.get(t[16])
+    self.e_machine = ElfMachine.get(t[17])
+    self.e_version = ElfVersion.get(t[18])
     self.e_entry = t[19]
     self.e_phoff = t[20]
     self.e_shoff = t[21]
@@ -310,7 +765,7 @@ class Elf64_Ehdr(object):
     values.extend([self.e_type, self.e_machine, self.e_version, self.e_entry,
       self.e_phoff, self.e_shoff, self.e_flags, self.e_ehsize, self.e_phentsize,
       self.e_phnum, self.e_shentsize, self.e_shnum, self.e_shstrndx])
-    res = struct.pack(self.format, *values)
+    res = self.codec.pack(*values)
     return BinArray(res)
 
   def layout(self):
@@ -321,35 +776,37 @@ class Elf64_Ehdr(object):
 #  Elf Sections
 #--------------------------------------------------------------------------
 
-class Elf64_Shdr(object):
-  """Elf64 section header."""
-  format = "<2I 4Q 2I 2Q"
-  size = struct.calcsize(format)
-  physical_size = size
-  logical_size = size
-  
-  def __init__(self, index=None, rawdata=None):
+class Elf_Shdr(object):
+  """Elf section header. Subclasses give the format, and the records that
+  the tables of each type of section hold."""
+  __metaclass__ = Record
+  fields = ('sh_name', 'sh_type', 'sh_flags', 'sh_addr', 'sh_offset',
+    'sh_size', 'sh_link', 'sh_info', 'sh_addralign', 'sh_entsize')
+  __slots__ = fields + ('index', 'owner', 'name', 'target', '_content')
+
+  def __init__(self, index=None, rawdata=None, offset=0):
     object.__init__(self)
     self.index = index
     if rawdata is not None:
-      self.fromBinArray(rawdata)
+      self.fromBinArray(rawdata, offset)
+    else:
+      for name in self.fields:
+        setattr(self, name, 0)
 
-  def fromBinArray(self, rawdata):
-    t = struct.unpack(self.format, rawdata)
-    self.sh_name = t[0]
-    self.sh_type = ElfShType(t[1])
-    self.sh_flags = t[2]
-    self.sh_addr = t[3]
-    self.sh_offset = t[4]
-    self.sh_size = t[5]
-    self.sh_link = t[6]
-    self.sh_info = t[7]
-    self.sh_addralign = t[8]
-    self.sh_entsize = t[9]
+  def fromBinArray(self, rawdata, offset=0):
+    values = self.codec.unpack_from(rawdata, offset)
+    for name, value in zip(self.fields, values):
+      setattr(self, name, value)
+    self.sh_type = ElfShType.get(self.sh_type)
 
   def resolve_names(self):
     self.content.resolve_names(self.owner)
 
+  def restore_content(self, data, summary):
+    """Set the content from data, without decoding the table again."""
+    self._content = Section(self)
+    self._content.restore(data, summary)
+
   @nested_property
   def content():
     def fget(self):
@@ -362,10 +819,12 @@ class Elf64_Shdr(object):
 
 # For sections that contain elements of specific types :
 
-class Elf64_Sym(object):
-  """Symbol Table entry"""
-  format = "<I 2B H 2Q "
-  entsize = struct.calcsize(format)
+class Elf_Sym(object):
+  """Symbol Table entry. Subclasses give the format and the order of the
+  fields."""
+  __metaclass__ = Record
+  __slots__ = ('st_name', 'st_info', 'st_other', 'st_shndx', 'st_value',
+    'st_size', 'name')
   def __init__(self, rawdata=None):
     object.__init__(self)
     if rawdata is not None:
@@ -374,7 +833,7 @@ class Elf64_Sym(object):
   @nested_property
   def st_binding():
     def fget(self):
-      return ElfSymbolBinding((self.st_info >> 4) & 0x0f)
+      return ElfSymbolBinding.get((self.st_info >> 4) & 0x0f)
     def fset(self, value):
       self.st_info = (((value & 0x0f) << 4) | (self.st_info & 0x0f))
     return locals()
@@ -382,7 +841,7 @@ class Elf64_Sym(object):
   @nested_property
   def st_type():
     def fget(self):
-       return ElfSymbolType(self.st_info & 0x0f)
+       return ElfSymbolType.get(self.st_info & 0x0f)
     def fset(self, value):
       self.st_info = ((self.st_info & 0xf0) | (value & 0x0f))
     return locals()
@@ -390,66 +849,61 @@ class Elf64_Sym(object):
   @nested_property
   def st_visibility():
     def fget(self):
-      return ElfSymbolVisibility(self.st_other & 0x03)
+      return ElfSymbolVisibility.get(self.st_other & 0x03)
     def fset(self, value):
       self.st_other = ((self.st_other & 0xfc) | (value & 0x03))
     return locals()
 
-  def fromBinArray(self, rawdata):
-    t = struct.unpack(self.format, rawdata)
-    self.st_name = t[0] # index in the strtab pointed by sh_link
-    self.st_info = t[1]
-    self.st_other = t[2]
-    self.st_shndx = ElfSectionIndex(t[3])
-    self.st_value = t[4]
-    self.st_size = t[5]
+  def fromBinArray(self, rawdata, offset=0):
+    # st_name is the index in the strtab pointed by sh_link
+    values = self.codec.unpack_from(rawdata, offset)
+    for name, value in zip(self.fields, values):
+      setattr(self, name, value)
+    self.st_shndx = ElfSectionIndex.get(self.st_shndx)
 
 
-class Elf64_Rel(object):
-  format = "<2Q"
+class Elf_Rel(object):
+  """Relocation entry without addend. Subclasses give the format, and how
+  r_info is split into the symbol index and the relocation type.
+
+  @cvar sym_shift: r_info is shifted right by this much to give r_sym.
+  @cvar type_mask: r_info is masked with this to give r_type.
+  @cvar relocation_type: the constants class of the relocation types.
+  """
+  __metaclass__ = Record
+  __slots__ = ('r_offset', 'r_info', 'r_addend')
   def __init__(self, rawdata=None):
     object.__init__(self)
     self.r_addend = 0 # No addend in a Rel.
     if rawdata is not None:
       self.fromBinArray(rawdata)
 
-  def fromBinArray(sef, rawdata):
-    t = struct.unpack(self.format, rawdata)
-    self.r_offset = t[0]
-    self.r_info = t[1]
+  def fromBinArray(self, rawdata, offset=0):
+    values = self.codec.unpack_from(rawdata, offset)
+    for name, value in zip(self.fields, values):
+      setattr(self, name, value)
 
   @nested_property
   def r_sym():
     def fget(self):
-      return (self.r_info >> 32) & 0xffffffff
+      return self.r_info >> self.sym_shift
     def fset(self, value):
-      self.r_info = ((value & 0xffffffff) << 32) | (self.r_info & 0xffffffff)
+      self.r_info = (value << self.sym_shift) | (self.r_info & self.type_mask)
     return locals()
 
   @nested_property
   def r_type():
     def fget(self):
-      return Amd64Relocation(self.r_info & 0xffffffff)
+      return self.relocation_type.get(self.r_info & self.type_mask)
     def fset(self, value):
-      self.r_info = (self.r_info & 0xffffffff00000000) | (value & 0xffffffff)
+      self.r_info = (self.r_info & ~self.type_mask) | (value & self.type_mask)
     return locals()
 
 
-class Elf64_Rela(Elf64_Rel):
-  format = "<2Q q"
-  def __init__(self, rawdata=None):
-    Elf64_Rel.__init__(self, rawdata)
-
-  def fromBinArray(self, rawdata):
-    t = struct.unpack(self.format, rawdata)
-    self.r_offset = t[0]
-    self.r_info = t[1]
-    self.r_addend = t[2]
-
-
-class Elf64_Dyn(object):
-  format = "<2Q"
-  size = struct.calcsize(format)
+class Elf_Dyn(object):
+  """Dynamic table entry. Subclasses give the format, and the one of the
+  value-less DT_NULL that ends the table, as word."""
+  __metaclass__ = Record
   def __init__(self, tag, value):
     object.__init__(self)
     self.d_tag = tag
@@ -465,7 +919,7 @@ class Elf64_Dyn(object):
 
   def toBinArray(self):
     ba = BinArray()
-    ba.fromstring(struct.pack(self.format, self.d_tag, self.d_val))
+    ba.fromstring(self.codec.pack(self.d_tag, self.d_val))
     return ba
 
 # Sections types :
@@ -484,7 +938,8 @@ def Section(shdr, data=None):
     SHT_NOBITS:         SNobits,
     SHT_REL:            SRel,
     SHT_SHLIB:          SShlib,
-    SHT_DYNSYM:         SDynsym
+    SHT_DYNSYM:         SDynsym,
+    SHT_GROUP:          SGroup
   }
   if shdr.sh_type in dataclass:
     return dataclass[shdr.sh_type](shdr, data)
@@ -505,10 +960,33 @@ class BaseSection(object):
 
   def toBinArray(self):
     if self.data:
-      return self.data
+      return self.writable_data()
     else:
       return BinArray()
 
+  @nested_property
+  def alignment():
+    def fget(self):
+      if self.header is None:
+        return 1
+      return max(self.header.sh_addralign, 1)
+    return locals()
+
+  @nested_property
+  def code():
+    def fget(self):
+      return self.header is not None and bool(
+        self.header.sh_flags & SHF_EXECINSTR)
+    return locals()
+
+  def writable_data(self):
+    """Return the content as a BinArray that can be modified in place.
+    Sections loaded from a mapped file only hold a read-only buffer on it,
+    which is copied the first time this is called."""
+    if isinstance(self.data, buffer):
+      self.data = BinArray(str(self.data))
+    return self.data
+
   def resolve_names(self, elf):
     """Nothing to resolve."""
     pass
@@ -536,46 +1014,135 @@ class SProgBits(BaseSection):
 
 
 class SSymtab(BaseSection):
-  entsize = struct.calcsize(Elf64_Sym.format)
+  """Symbol table, decoded as columns.
+  Each field of the symbols is available as a column (st_name, st_value,
+  st_size, st_info, st_other and st_shndx), and the symbols are sorted out
+  by the local, global, defined, undefined and common masks."""
+  masks = ('common_mask', 'undefined_mask', 'defined_mask', 'local_mask',
+    'global_mask')
   def __init__(self, shdr, data=None):
-    self.symtab = []
+    self.record = shdr.records[shdr.sh_type]
+    self._names = None
+    # Final addresses, see Elf.resolve_addresses()
+    self.addresses = None
+    # The GOT slots of the symbols that need one, see Elf.allocate_got()
+    self.got_slots = {}
+    if data is None:
+      # A new, empty table, to be filled with append()
+      self._names = []
+      self.nument = 0
+      for name in self.record.fields:
+        setattr(self, name, [])
     BaseSection.__init__(self, shdr, data)
 
   def fromBinArray(self, data):
     BaseSection.fromBinArray(self, data)
-    nument = len(data) / self.entsize
-    for i in range(nument):
-      start = i * self.entsize
-      end = i * self.entsize + self.entsize
-      self.symtab.append(Elf64_Sym(data[start:end]))
+    nument = len(data) / self.record.size
+    self.nument = nument
+    for name, column in decode_table(self.record, data, nument).iteritems():
+      setattr(self, name, column)
+
+    if numpy is not None:
+      binding = self.st_info >> 4
+      ignored = ((self.st_info & 0x0f) == STT_FILE) | (self.st_shndx == SHN_ABS)
+      self.common_mask = ~ignored & (self.st_shndx == SHN_COMMON)
+      self.undefined_mask = ~ignored & (self.st_shndx == SHN_UNDEF)
+      self.defined_mask = ~(ignored | self.common_mask | self.undefined_mask)
+      self.local_mask = self.defined_mask & (binding == STB_LOCAL)
+      self.global_mask = self.defined_mask & (binding != STB_LOCAL)
+    else:
+      binding = [info >> 4 for info in self.st_info]
+      ignored = [(info & 0x0f) == STT_FILE or shndx == SHN_ABS
+        for info, shndx in zip(self.st_info, self.st_shndx)]
+      self.common_mask = [not i and shndx == SHN_COMMON
+        for i, shndx in zip(ignored, self.st_shndx)]
+      self.undefined_mask = [not i and shndx == SHN_UNDEF
+        for i, shndx in zip(ignored, self.st_shndx)]
+      self.defined_mask = [not (i or c or u)
+        for i, c, u in zip(ignored, self.common_mask, self.undefined_mask)]
+      self.local_mask = [d and b == STB_LOCAL
+        for d, b in zip(self.defined_mask, binding)]
+      self.global_mask = [d and b != STB_LOCAL
+        for d, b in zip(self.defined_mask, binding)]
 
   def resolve_names(self, elf):
+    if self._names is not None:
+      # Already done, or restored
+      return
     # For a symtab, the strtab is indicated by sh_link
     strtab = elf.shdrs[self.header.sh_link].content
     # Resolve for all symbols in the table
-    for sym in self.symtab:
-      sym.name = strtab[sym.st_name]
+    self._names = [strtab[n] for n in tolist(self.st_name)]
+
+  @nested_property
+  def names():
+    def fget(self):
+      if self._names is None:
+        self.resolve_names(self.header.owner)
+      return self._names
+    return locals()
+
+  def __len__(self):
+    return self.nument
+
+  def summary(self):
+    """Return the decoded columns, masks and names, to be given back to
+    restore()."""
+    summary = dict((name, getattr(self, name))
+      for name in self.record.fields + self.masks)
+    summary['names'] = self.names
+    return summary
+
+  def restore(self, data, summary):
+    """Set the content to data, which was already decoded in summary."""
+    BaseSection.fromBinArray(self, data)
+    for name in self.record.fields + self.masks:
+      setattr(self, name, summary[name])
+    self._names = summary['names']
+    self.nument = len(self._names)
+
+  def append(self, name, shndx, value=0, size=0, info=0, other=0):
+    """Add a symbol to a table created from scratch.
+    @return: the index of the new symbol."""
+    self._names.append(name)
+    self.st_name.append(0)
+    self.st_shndx.append(shndx)
+    self.st_value.append(value)
+    self.st_size.append(size)
+    self.st_info.append(info)
+    self.st_other.append(other)
+    self.nument += 1
+    return self.nument - 1
 
   def __getitem__(self, key):
-    return self.symtab[key]
+    """Build a single symbol record out of the columns."""
+    sym = self.record()
+    for name in self.record.fields:
+      setattr(sym, name, int(getattr(self, name)[key]))
+    sym.st_shndx = ElfSectionIndex.get(sym.st_shndx)
+    sym.name = self.names[key]
+    return sym
 
 
 class SStrtab(BaseSection):
   """This one behaves in two completely different ways.
   If it's given a section header and data, it will act as read-only, only to
   be used for name resolution.
-  If it's not given any argument, it can be used to create a new Strtab."""
+  If it's not given any argument, it can be used to create a new Strtab.
+  When read-only, the strings are only decoded, and cached, when looked up."""
   def __init__(self, shdr=None, data=None):
     self.readonly = (shdr is not None)
     self.by_index = {}
     self.by_name = {}
     self.table = []
+    self.strings = ""
+    self.indexed = False
     BaseSection.__init__(self, shdr, data)
     self.virt_addr = None
 
   def toBinArray(self):
     if self.readonly:
-      return BaseSection.toBinArray()
+      return BaseSection.toBinArray(self)
 
     ba = BinArray()
     keys = self.by_index.keys()
@@ -587,6 +1154,8 @@ class SStrtab(BaseSection):
   @nested_property
   def size():
     def fget(self):
+      if self.readonly:
+        return len(self.data)
       if len(self.by_index) == 0:
         return 0
       return len(self.data)
@@ -595,33 +1164,46 @@ class SStrtab(BaseSection):
   logical_size = size
 
   def iteritems(self):
+    if self.readonly:
+      self.index_all()
     return self.by_index.iteritems()
 
   # Resolution functions
 
   def fromBinArray(self, data):
     BaseSection.fromBinArray(self, data)
-    itab = data.tostring().split('\0')
+    self.strings = tostring(data)
+
+  def index_all(self):
+    """Decode all the strings of a read-only table at once."""
+    if self.indexed:
+      return
     i = 0
-    for sname in itab:
-      self.by_index[i] = sname
-      self.by_name[sname] = i
+    for sname in self.strings.split('\0'):
+      self.by_index.setdefault(i, sname)
+      self.by_name.setdefault(sname, i)
       i += len(sname) + 1
+    self.indexed = True
 
   def __getitem__(self, key):
-    if isinstance(key, int):
+    if isinstance(key, (int, long)):
       # Find string by index
       if key in self.by_index:
         # Already computed, return it
         return self.by_index[key]
       else:
-        # It references a substring
-        v = self.data[key:].tostring().split('\0')[0]
+        # Either the beginning of a string, or a substring of another one.
+        end = self.strings.find('\0', key)
+        if end < 0:
+          end = len(self.strings)
+        v = self.strings[key:end]
         self.by_index[key] = v
-        self.by_name[v] = key
+        self.by_name.setdefault(v, key)
         return v
     else:
       # find index by name
+      if key not in self.by_name and self.readonly:
+        self.index_all()
       if key in self.by_name:
         return self.by_name[key]
       else:
@@ -645,28 +1227,79 @@ class SStrtab(BaseSection):
 
 
 class SRela(BaseSection):
-  entsize = struct.calcsize(Elf64_Rela.format)
+  """Relocation table, decoded as columns.
+  The entries are available as the r_offset, r_info, r_sym, r_type and
+  r_addend columns. Their symbols are only looked up in the symtab, by
+  index, when the relocation is applied."""
   def __init__(self, shdr, data=None):
-    self.relatab = []
+    self.record = shdr.records[shdr.sh_type]
+    if data is None:
+      # A new, empty table, to be filled with append()
+      self.nument = 0
+      for name in self.record.fields + ('r_sym', 'r_type'):
+        setattr(self, name, [])
     BaseSection.__init__(self, shdr, data)
 
   def fromBinArray(self, data):
     BaseSection.fromBinArray(self, data)
-    nument = len(data) / self.entsize
-    for i in range(nument):
-      start = i * self.entsize
-      end = i * self.entsize + self.entsize
-      self.relatab.append(Elf64_Rela(data[start:end]))
+    self.nument = len(data) / self.record.size
+    columns = decode_table(self.record, data, self.nument)
+    for name, column in columns.iteritems():
+      setattr(self, name, column)
+
+    shift = self.record.sym_shift
+    mask = self.record.type_mask
+    if numpy is not None:
+      self.r_sym = self.r_info >> shift
+      self.r_type = self.r_info & mask
+    else:
+      self.r_sym = [info >> shift for info in self.r_info]
+      self.r_type = [info & mask for info in self.r_info]
+
+  def summary(self):
+    """Return the decoded columns, to be given back to restore()."""
+    return dict((name, getattr(self, name))
+      for name in self.record.fields + ('r_sym', 'r_type'))
+
+  def restore(self, data, summary):
+    """Set the content to data, which was already decoded in summary."""
+    BaseSection.fromBinArray(self, data)
+    for name, column in summary.iteritems():
+      setattr(self, name, column)
+    self.nument = len(self.r_offset)
 
   def resolve_names(self, elf):
-    """Badly named, this wil resolve to a symtab entry..."""
+    """Badly named, this will only find the symtab and the target."""
     # sh_link leads to the symtab
     self.symtab = elf.shdrs[self.header.sh_link].content
     # sh_info links to the section on which the relocation applies
     self.header.target = elf.shdrs[self.header.sh_info]
-    for r in self.relatab:
-      r.symbol = self.symtab[r.r_sym]
 
+  def __len__(self):
+    return self.nument
+
+  def append(self, r_offset, r_type, r_sym, r_addend=0):
+    """Add an entry to a table created from scratch."""
+    self.r_offset.append(r_offset)
+    self.r_info.append((r_sym << self.record.sym_shift) | r_type)
+    self.r_sym.append(r_sym)
+    self.r_type.append(r_type)
+    self.r_addend.append(r_addend)
+    self.nument += 1
+
+
+class SRel(SRela):
+  """Relocation table without explicit addends. The r_addend column is None,
+  the addends are read from the relocated fields themselves."""
+  r_addend = None
+
+  def append(self, r_offset, r_type, r_sym):
+    """Add an entry to a table created from scratch."""
+    self.r_offset.append(r_offset)
+    self.r_info.append((r_sym << self.record.sym_shift) | r_type)
+    self.r_sym.append(r_sym)
+    self.r_type.append(r_type)
+    self.nument += 1
 
 
 class SHash(BaseSection):
@@ -695,23 +1328,47 @@ class SNobits(BaseSection):
     return BinArray()
 
 
-class SRel(BaseSection):
+class SShlib(BaseSection):
   pass
 
 
-class SShlib(BaseSection):
-  pass
+class SGroup(BaseSection):
+  """Section group, such as a COMDAT group. Its members are the indices of
+  the sections of the group, and its signature is the name of the symbol
+  that identifies it."""
+  def __init__(self, shdr, data=None):
+    self.flags = 0
+    self.members = []
+    self.signature = None
+    BaseSection.__init__(self, shdr, data)
+
+  def fromBinArray(self, data):
+    BaseSection.fromBinArray(self, data)
+    words = struct.unpack_from("<%dI" % (len(data) / 4), data)
+    if words:
+      self.flags = words[0]
+      self.members = list(words[1:])
+
+  def resolve_names(self, elf):
+    # sh_link leads to the symtab, sh_info to the signature in it
+    symtab = elf.shdrs[self.header.sh_link].content
+    sym = symtab[self.header.sh_info]
+    if sym.st_type == STT_SECTION:
+      self.signature = elf.shdrs[sym.st_shndx].name
+    else:
+      self.signature = sym.name
 
 
 class SDynsym(SSymtab):
   pass
 
 
-class Elf64_Phdr(object):
-  format = "<2I 6Q"
-  size = struct.calcsize(format)
-  physical_size = size
-  logical_size = size
+class Elf_Phdr(object):
+  """Program header. Subclasses give the format and the order of the
+  fields."""
+  __metaclass__ = Record
+  __slots__ = ('owner', 'virt_addr', 'file_offset', 'p_type', 'p_flags',
+    'p_offset', 'p_vaddr', 'p_paddr', 'p_filesz', 'p_memsz', 'p_align')
 
   def __init__(self):
     object.__init__(self)
@@ -725,8 +1382,7 @@ class Elf64_Phdr(object):
     self.p_align = 1
 
   def toBinArray(self):
-    res = struct.pack(self.format, self.p_type, self.p_flags, self.p_offset,
-      self.p_vaddr, self.p_paddr, self.p_filesz, self.p_memsz, self.p_align)
+    res = self.codec.pack(*[getattr(self, name) for name in self.fields])
     return BinArray(res)
 
   def layout(self):
@@ -742,77 +1398,98 @@ class Elf64_Phdr(object):
 
 
 class BaseSegment(object):
+  """A segment, whose content is laid out in order, each part aligned as its
+  section requires. The padding before each part is in self.padding."""
   def __init__(self, align=0):
     object.__init__(self)
     self.align = align
     self.content = []
+    self.padding = []
 
   def add_content(self, content):
     self.content.append(content)
 
   def toBinArray(self):
     ba = BinArray()
-    for c in self.content:
+    for c, pad in zip(self.content, self.padding):
+      if pad:
+        ba.fromstring(padding(pad, alignment(c)[1]))
       ba.extend(c.toBinArray())
     return ba
 
   @nested_property
   def size():
     def fget(self):
-      return sum(c.size for c in self.content)
+      return sum(c.size for c in self.content) + sum(self.padding)
     return locals()
   physical_size = size
   logical_size = size
 
+  def end(self, virt_addr):
+    """Tell where the content added so far ends, once laid out from
+    virt_addr."""
+    for i in self.content:
+      virt_addr += -virt_addr % alignment(i)[0] + i.logical_size
+    return virt_addr
+
+  def layout_content(self, content, virt_addr, file_offset):
+    """Lay out parts of the segment from virt_addr and file_offset.
+    @return: the padding before each part, and where the last one ends."""
+    padding = []
+    for i in content:
+      pad = -virt_addr % alignment(i)[0]
+      padding.append(pad)
+      virt_addr += pad
+      i.virt_addr = virt_addr
+      i.file_offset = file_offset + pad
+      i.layout()
+      virt_addr += i.logical_size
+      file_offset += pad + i.physical_size
+    return padding, virt_addr, file_offset
+
 
 class TextSegment(BaseSegment):
   def __init__(self, align=0):
     BaseSegment.__init__(self, align)
 
   def layout(self):
-    virt_addr = self.virt_addr
-    file_offset = self.file_offset
-    for i in self.content:
-      i.virt_addr = virt_addr
-      i.file_offset = file_offset
-      i.layout()
-      virt_addr += i.logical_size
-      file_offset += i.physical_size
+    self.padding, virt_addr, file_offset = self.layout_content(self.content,
+      self.virt_addr, self.file_offset)
 
 
 class DataSegment(BaseSegment):
   def __init__(self, align=0):
     BaseSegment.__init__(self, align)
     self.nobits = []
+    self.nobits_padding = []
 
   def add_nobits(self, content):
     self.nobits.append(content)
 
   def layout(self):
-    virt_addr = self.virt_addr
-    file_offset = self.file_offset
-    for i in self.content:
-      i.virt_addr = virt_addr
-      i.file_offset = file_offset
-      i.layout()
-      virt_addr += i.logical_size
-      file_offset += i.physical_size
+    self.padding, virt_addr, file_offset = self.layout_content(self.content,
+      self.virt_addr, self.file_offset)
+    self.nobits_padding, virt_addr, file_offset = self.layout_content(
+      self.nobits, virt_addr, 0)
     for i in self.nobits:
-      i.virt_addr = virt_addr
       i.file_offset = 0
-      i.layout()
-      virt_addr += i.logical_size
 
   @nested_property
   def logical_size():
     def fget(self):
-      return self.physical_size + sum(c.logical_size for c in self.nobits)
+      return (self.physical_size + sum(c.logical_size for c in self.nobits) +
+        sum(self.nobits_padding))
     return locals()
 
 
 class Dynamic(object):
-  def __init__(self):
+  def __init__(self, record):
+    """
+    @param record: the class of the entries, Elf64_Dyn or Elf32_Dyn.
+    """
     object.__init__(self)
+    self.record = record
+    self.alignment = record.word.size
     self.dyntab = []
     self.strtab = SStrtab()
 
@@ -820,20 +1497,20 @@ class Dynamic(object):
   def size():
     def fget(self):
       # End the table with a DT_NULL without associated value.
-      return (Elf64_Dyn.size * len(self.dyntab) + struct.calcsize("Q"))
+      return (self.record.size * len(self.dyntab) + self.record.word.size)
     return locals()
   physical_size = size
   logical_size = size
 
   def add_shlib(self, shlib):
     offset = self.strtab.append(shlib)
-    self.dyntab.append(Elf64_Dyn(DT_NEEDED, offset))
+    self.dyntab.append(self.record(DT_NEEDED, offset))
 
   def add_symtab(self, vaddr):
-    self.dyntab.append(Elf64_Dyn(DT_SYMTAB, vaddr))
+    self.dyntab.append(self.record(DT_SYMTAB, vaddr))
 
   def add_debug(self):
-    self.dyntab.append(Elf64_Dyn(DT_DEBUG, 0))
+    self.dyntab.append(self.record(DT_DEBUG, 0))
 
   def layout(self):
     # Adjust the address of the strtab, if 
@@ -841,7 +1518,7 @@ class Dynamic(object):
       print "Ooops, strtab's address is not known yet. Aborting."
       exit(1)
     else:
-      self.dyntab.append(Elf64_Dyn(DT_STRTAB, self.strtab.virt_addr))
+      self.dyntab.append(self.record(DT_STRTAB, self.strtab.virt_addr))
 
   @nested_property
   def dt_debug_address():
@@ -856,7 +1533,7 @@ class Dynamic(object):
     ba = BinArray()
     for d in self.dyntab:
       ba.extend(d.toBinArray())
-    null = struct.pack("<Q", DT_NULL)
+    null = self.record.word.pack(DT_NULL)
     ba.fromstring(null)
     return ba
 
@@ -907,3 +1584,205 @@ class Interpreter(object):
     """
     pass
 
+
+
+#--------------------------------------------------------------------------
+#  ELF classes
+#--------------------------------------------------------------------------
+
+class Elf64_Sym(Elf_Sym):
+  format = "<I 2B H 2Q"
+  fields = ('st_name', 'st_info', 'st_other', 'st_shndx', 'st_value', 'st_size')
+  dtype = [('st_name', '<u4'), ('st_info', 'u1'), ('st_other', 'u1'),
+    ('st_shndx', '<u2'), ('st_value', '<u8'), ('st_size', '<u8')]
+  __slots__ = ()
+
+
+class Elf64_Rel(Elf_Rel):
+  format = "<2Q"
+  fields = ('r_offset', 'r_info')
+  dtype = [('r_offset', '<u8'), ('r_info', '<u8')]
+  sym_shift = 32
+  type_mask = 0xffffffff
+  relocation_type = Amd64Relocation
+  __slots__ = ()
+
+
+class Elf64_Rela(Elf64_Rel):
+  format = "<2Q q"
+  fields = ('r_offset', 'r_info', 'r_addend')
+  dtype = [('r_offset', '<u8'), ('r_info', '<u8'), ('r_addend', '<i8')]
+  __slots__ = ()
+
+
+class Elf64_Shdr(Elf_Shdr):
+  """Elf64 section header."""
+  format = "<2I 4Q 2I 2Q"
+  records = {SHT_SYMTAB: Elf64_Sym, SHT_DYNSYM: Elf64_Sym,
+    SHT_REL: Elf64_Rel, SHT_RELA: Elf64_Rela}
+  __slots__ = ()
+
+
+class Elf64_Phdr(Elf_Phdr):
+  format = "<2I 6Q"
+  fields = ('p_type', 'p_flags', 'p_offset', 'p_vaddr', 'p_paddr',
+    'p_filesz', 'p_memsz', 'p_align')
+  __slots__ = ()
+
+
+class Elf64_Dyn(Elf_Dyn):
+  format = "<2Q"
+  word = struct.Struct("<Q")
+
+
+class Elf64_Ehdr(Elf_Ehdr):
+  format = "<16B 2H I 3Q I 6H"
+  machine = EM_X86_64
+  Phdr = Elf64_Phdr
+  Shdr = Elf64_Shdr
+
+
+class Elf64(Elf):
+  """Handles an Elf64 object for x86_64."""
+  elfclass = ELFCLASS64
+  machine = EM_X86_64
+  interpreter = "/lib64/ld-linux-x86-64.so.2"
+  Ehdr = Elf64_Ehdr
+  Shdr = Elf64_Shdr
+  Phdr = Elf64_Phdr
+  Dyn = Elf64_Dyn
+  relocation_type = Amd64Relocation
+  got_entry = struct.Struct("<Q")
+  relaxed_relocation = R_X86_64_PC32
+  branch_relocations = (R_X86_64_PC32, R_X86_64_PLT32)
+  relocations = {
+    # Direct 64 bit address
+    R_X86_64_64:    relocation("<Q", absolute),
+    # PC relative 32 bit signed
+    R_X86_64_PC32:  relocation("<i", pc_relative),
+    # 32 bit PLT address, there is no PLT so the symbol itself
+    R_X86_64_PLT32: relocation("<i", pc_relative),
+    # 32 bit signed PC relative offset to GOT
+    R_X86_64_GOTPCREL: relocation("<i", pc_relative, got=True),
+    # The same, for an instruction that can be relaxed
+    R_X86_64_GOTPCRELX: relocation("<i", pc_relative, got=True),
+    # The same, for an instruction with a REX prefix
+    R_X86_64_REX_GOTPCRELX: relocation("<i", pc_relative, got=True),
+    # Direct 32 bit zero extended
+    R_X86_64_32:    relocation("<I", absolute),
+    # Direct 32 bit sign extended
+    R_X86_64_32S:   relocation("<i", absolute),
+    # 16 bit sign extended pc relative
+    R_X86_64_PC16:  relocation("<h", pc_relative),
+    # Direct 16 bit zero extended
+    R_X86_64_16:    relocation("<H", absolute),
+    # 8 bit sign extended pc relative
+    R_X86_64_PC8:   relocation("b", pc_relative),
+    # Direct 8 bit sign extended
+    R_X86_64_8:     relocation("b", absolute),
+  }
+
+  def relax(self, data, offset, r_type):
+    """Rewrite the instructions that the x86_64 ABI allows to relax, for
+    GOTPCRELX and REX_GOTPCRELX: a mov from the GOT slot becomes a lea of
+    the symbol, an indirect call or jmp becomes a direct one."""
+    if r_type not in [R_X86_64_GOTPCRELX, R_X86_64_REX_GOTPCRELX]:
+      return False
+    if offset < 2:
+      return False
+    opcode, modrm = data[offset - 2], data[offset - 1]
+    if opcode == 0x8b and modrm & 0xc7 == 0x05:
+      # mov foo@GOTPCREL(%rip), %reg -> lea foo(%rip), %reg
+      data[offset - 2] = 0x8d
+    elif r_type == R_X86_64_GOTPCRELX and opcode == 0xff and modrm == 0x15:
+      # call *foo@GOTPCREL(%rip) -> addr32 call foo
+      data[offset - 2] = 0x67
+      data[offset - 1] = 0xe8
+    elif r_type == R_X86_64_GOTPCRELX and opcode == 0xff and modrm == 0x25:
+      # jmp *foo@GOTPCREL(%rip) -> nop; jmp foo
+      data[offset - 2] = 0x90
+      data[offset - 1] = 0xe9
+    else:
+      return False
+    return True
+
+  def is_branch(self, data, offset, r_type):
+    """Direct calls and jumps, as well as the indirect ones through the GOT
+    slot of the symbol, with -fno-plt."""
+    if r_type == R_X86_64_GOTPCRELX and offset >= 2:
+      if data[offset - 2:offset] in ['\xff\x15', '\xff\x25']:
+        return True
+    return Elf.is_branch(self, data, offset, r_type)
+
+
+class Elf32_Sym(Elf_Sym):
+  format = "<3I 2B H"
+  fields = ('st_name', 'st_value', 'st_size', 'st_info', 'st_other', 'st_shndx')
+  dtype = [('st_name', '<u4'), ('st_value', '<u4'), ('st_size', '<u4'),
+    ('st_info', 'u1'), ('st_other', 'u1'), ('st_shndx', '<u2')]
+  __slots__ = ()
+
+
+class Elf32_Rel(Elf_Rel):
+  format = "<2I"
+  fields = ('r_offset', 'r_info')
+  dtype = [('r_offset', '<u4'), ('r_info', '<u4')]
+  sym_shift = 8
+  type_mask = 0xff
+  relocation_type = Intel386Relocation
+  __slots__ = ()
+
+
+class Elf32_Rela(Elf32_Rel):
+  format = "<2I i"
+  fields = ('r_offset', 'r_info', 'r_addend')
+  dtype = [('r_offset', '<u4'), ('r_info', '<u4'), ('r_addend', '<i4')]
+  __slots__ = ()
+
+
+class Elf32_Shdr(Elf_Shdr):
+  """Elf32 section header."""
+  format = "<10I"
+  records = {SHT_SYMTAB: Elf32_Sym, SHT_DYNSYM: Elf32_Sym,
+    SHT_REL: Elf32_Rel, SHT_RELA: Elf32_Rela}
+  __slots__ = ()
+
+
+class Elf32_Phdr(Elf_Phdr):
+  format = "<8I"
+  fields = ('p_type', 'p_offset', 'p_vaddr', 'p_paddr', 'p_filesz',
+    'p_memsz', 'p_flags', 'p_align')
+  __slots__ = ()
+
+
+class Elf32_Dyn(Elf_Dyn):
+  format = "<i I"
+  word = struct.Struct("<I")
+
+
+class Elf32_Ehdr(Elf_Ehdr):
+  format = "<16B 2H 5I 6H"
+  machine = EM_386
+  Phdr = Elf32_Phdr
+  Shdr = Elf32_Shdr
+
+
+class Elf32(Elf):
+  """Handles an Elf32 object for i386."""
+  elfclass = ELFCLASS32
+  machine = EM_386
+  interpreter = "/lib/ld-linux.so.2"
+  Ehdr = Elf32_Ehdr
+  Shdr = Elf32_Shdr
+  Phdr = Elf32_Phdr
+  Dyn = Elf32_Dyn
+  relocation_type = Intel386Relocation
+  branch_relocations = (R_386_PC32, R_386_PLT32)
+  relocations = {
+    # Direct 32 bit address
+    R_386_32:       relocation("<I", absolute),
+    # PC relative 32 bit signed
+    R_386_PC32:     relocation("<i", pc_relative),
+    # 32 bit PLT address, there is no PLT so the symbol itself
+    R_386_PLT32:    relocation("<i", pc_relative),
+  }
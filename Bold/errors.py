@@ -15,6 +15,7 @@
 class NotRelocatableObject(Exception):
   """Raised when an input file is not a relocatable ELF object."""
   def __init__(self, path):
+    Exception.__init__(self, path)
     self.path = path
   def __str__(self):
     return "File '%s' is not a relocatable object file" % self.path
@@ -22,6 +23,7 @@ class NotRelocatableObject(Exception):
 class UnsupportedObject(Exception):
   """Raised when an input file is not of a supported arch."""
   def __init__(self, path, reason):
+    Exception.__init__(self, path, reason)
     self.path = path
     self.reason = reason
   def __str__(self):
@@ -30,6 +32,7 @@ class UnsupportedObject(Exception):
 class LibNotFound(Exception):
   """Raised if a shared library could not be found."""
   def __init__(self, libname):
+    Exception.__init__(self, libname)
     self.libname = libname
   def __str__(self):
     return "Cannot find shared library for '%s'" % self.libname
@@ -37,6 +40,7 @@ class LibNotFound(Exception):
 class UndefinedSymbol(Exception):
   """Raised if a symbol is referenced but not declared."""
   def __init__(self, symbol_name):
+    Exception.__init__(self, symbol_name)
     self.symbol = symbol_name
   def __str__(self):
     return "Undefined reference to '%s'" % self.symbol
@@ -44,6 +48,16 @@ class UndefinedSymbol(Exception):
 class RedefinedSymbol(Exception):
   """Raised if a symbol is defined more than once."""
   def __init__(self, symbol_name):
+    Exception.__init__(self, symbol_name)
     self.symbol = symbol_name
   def __str__(self):
     return "Symbol '%s' is declared twice" % self.symbol
+
+class InvalidProfile(Exception):
+  """Raised if a line of a symbol ordering or call graph file is wrong."""
+  def __init__(self, path, line):
+    Exception.__init__(self, path, line)
+    self.path = path
+    self.line = line
+  def __str__(self):
+    return "File '%s', line %d: invalid entry" % (self.path, self.line)
@@ -14,13 +14,24 @@ Main entry point for the bold linker.
 """
 
 from constants import *
-from BinArray import BinArray
-from elf import Elf64, Elf64_Phdr, Elf64_Shdr, TextSegment, DataSegment
-from elf import SStrtab, SSymtab, SProgBits, SNobits, Dynamic, Interpreter
+from BinArray import BinArray, tostring
+from elf import Elf64, Elf32, TextSegment, DataSegment, Dynamic, Interpreter
+from elf import tolist, writable, select
 from errors import *
+from archive import Archive
 from ctypes import CDLL
 from ctypes.util import find_library
+from multiprocessing import Pool
+from collections import deque
+import bisect
+import mmap
 import struct
+import time
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
 
 
 def hash_name(name):
@@ -34,37 +45,461 @@ def hash_name(name):
   return h
 
 
+def parse_object(job):
+  """Parse a relocatable file, in a worker process of
+  BoldLinker.add_objects().
+  @param job: the Elf class to parse with, and the path to the file.
+  @return: the summary of the parsed object.
+  """
+  elf, filename = job
+  obj = elf(filename)
+  obj.resolve_names()
+  obj.find_symbols()
+  return obj.summary()
+
+
+def split_strings(data, entsize):
+  """Split the content of a SHF_STRINGS section into its strings.
+  @param entsize: the size of the characters.
+  @return: a list of (offset, string), the strings with their terminator, or
+    None if the last one is not terminated.
+  """
+  strings = []
+  terminator = "\0" * entsize
+  offset = 0
+  while offset < len(data):
+    end = data.find(terminator, offset)
+    # The terminator is a whole character
+    while end >= 0 and (end - offset) % entsize:
+      end = data.find(terminator, end + 1)
+    if end < 0:
+      return None
+    end += entsize
+    strings.append((offset, data[offset:end]))
+    offset = end
+  return strings
+
+
+def split_constants(data, entsize):
+  """Split the content of a constant pool into its entries.
+  @return: a list of (offset, entry), or None if the size of the section is
+    not a multiple of entsize.
+  """
+  if not entsize or len(data) % entsize:
+    return None
+  return [(offset, data[offset:offset + entsize])
+    for offset in range(0, len(data), entsize)]
+
+
+def place_strings(strings, entsize, align):
+  """Lay out the strings of a merged section. Sorted by their reversed
+  characters, the strings that end the previous one follow it, and point
+  into it instead of being stored again.
+  @param strings: the set of the strings, with their terminator.
+  @param entsize: the size of the characters.
+  @param align: the alignment of each string.
+  @return: the offset of each string, and the content of the section.
+  """
+  def reverse(s):
+    return "".join([s[n:n + entsize]
+      for n in range(len(s) - entsize, -1, -entsize)])
+
+  placed = {}
+  pieces = []
+  size = 0
+  previous = None
+  for s in sorted(strings, key=reverse, reverse=True):
+    if previous is not None and previous.endswith(s):
+      shift = len(previous) - len(s)
+      if shift % entsize == 0 and (placed[previous] + shift) % align == 0:
+        placed[s] = placed[previous] + shift
+        continue
+    padding = -size % align
+    pieces.append("\0" * padding + s)
+    placed[s] = size + padding
+    size += padding + len(s)
+    previous = s
+  return placed, "".join(pieces)
+
+
+def place_constants(entries, align):
+  """Lay out the entries of a merged constant pool, in the order they are
+  first seen.
+  @param entries: the entries, in link order, with duplicates.
+  @return: the offset of each entry, and the content of the section.
+  """
+  placed = {}
+  pieces = []
+  size = 0
+  for e in entries:
+    if e in placed:
+      continue
+    padding = -size % align
+    pieces.append("\0" * padding + e)
+    placed[e] = size + padding
+    size += padding + len(e)
+  return placed, "".join(pieces)
+
+
+def merged_offset(entries, offset):
+  """Find where an offset in a merged section ended up.
+  @param entries: the offsets of the entries in the section, and the offsets
+    of the same entries in the merged section.
+  """
+  starts, offsets = entries
+  n = max(bisect.bisect_right(starts, offset) - 1, 0)
+  return offsets[n] + offset - starts[n]
+
+
+# The groups of code, in the order they are laid out, with the prefixes of
+# the names of the sections that GCC puts in them. The other sections are
+# "normal".
+text_groups = [
+  ("startup", ".text.startup"),
+  ("hot", ".text.hot"),
+  ("normal", None),
+  ("unlikely", ".text.unlikely"),
+  ("exit", ".text.exit"),
+]
+
+def text_group(content):
+  """Tell in which group of text_groups a code section goes.
+  @return: the index of the group."""
+  name = getattr(content.header, 'name', None) or ""
+  for n, (group, prefix) in enumerate(text_groups):
+    if prefix and (name == prefix or name.startswith(prefix + ".")):
+      return n
+  return 2
+
+
+# The size of the pages, for the statistics on the code layout
+page_size = 0x1000
+
+# Limits of the call graph clustering: clusters stop growing at a megabyte,
+# and a cluster is not appended to a much colder one.
+max_cluster_size = 0x100000
+max_density_degradation = 8
+
+def cluster_sections(sizes, edges):
+  """Order sections so that the functions calling each other the most are
+  next to each other, with the C3 heuristic. From the hottest section to the
+  coldest, the cluster of each section is appended to the cluster of its most
+  frequent caller. The clusters are then laid out from the hottest.
+  @param sizes: the size of each section.
+  @param edges: the (caller, callee, count) of each call graph entry, the
+    caller and callee being indexes in sizes.
+  @return: the indexes of the sections, in their new order.
+  """
+  count = len(sizes)
+  weights = [0] * count
+  callers = [(0, None)] * count   # The most frequent caller of each section
+  for caller, callee, n in edges:
+    if caller != callee:
+      weights[callee] += n
+      if n > callers[callee][0]:
+        callers[callee] = (n, caller)
+
+  # Every section starts as a cluster of its own, led by itself
+  leaders = range(count)
+  members = [[s] for s in xrange(count)]
+  cluster_sizes = [max(size, 1) for size in sizes]
+  cluster_weights = list(weights)
+  def density(c):
+    return float(cluster_weights[c]) / cluster_sizes[c]
+  def leader(s):
+    while leaders[s] != s:
+      leaders[s] = leaders[leaders[s]]
+      s = leaders[s]
+    return s
+
+  for c in sorted(xrange(count), key=lambda s: -density(s)):
+    n, caller = callers[c]
+    # Not worth it when that caller makes few of the calls
+    if caller is None or n * 10 <= weights[c]:
+      continue
+    target = leader(caller)
+    if target == c:
+      continue
+    size = cluster_sizes[c] + cluster_sizes[target]
+    weight = cluster_weights[c] + cluster_weights[target]
+    if size > max_cluster_size:
+      continue
+    if float(weight) / size < density(target) / max_density_degradation:
+      continue
+    leaders[c] = target
+    members[target] += members[c]
+    members[c] = []
+    cluster_sizes[target] = size
+    cluster_weights[target] = weight
+
+  clusters = [c for c in xrange(count) if members[c]]
+  clusters.sort(key=lambda c: -density(c))
+  return sum((members[c] for c in clusters), [])
+
+
+def section_padding(parts, start):
+  """Tell how much padding the sections need, laid out in that order from
+  the address start."""
+  padding = 0
+  offset = start
+  for c in parts:
+    pad = -offset % c.alignment
+    padding += pad
+    offset += pad + c.logical_size
+  return padding
+
+
+def pack_sections(parts, start=0):
+  """Order the sections of a segment so that they need little padding: the
+  most aligned first, but whenever it would need padding, the gap is filled
+  with less aligned ones that fit in it. The link order is kept if it needs
+  less padding still.
+  @param parts: the content of the sections, in link order.
+  @param start: the address where the first section will be placed.
+  @return: the same, reordered.
+  """
+  buckets = {}
+  for c in parts:
+    buckets.setdefault(c.alignment, deque()).append(c)
+  alignments = sorted(buckets, reverse=True)
+  order = []
+  offset = start
+  while len(order) < len(parts):
+    left = [a for a in alignments if buckets[a]]
+    a = left[0]
+    gap = -offset % a
+    for filler in left[1:]:
+      c = buckets[filler][0]
+      if offset % filler == 0 and c.logical_size <= gap:
+        a = filler
+        break
+    else:
+      offset += gap
+    c = buckets[a].popleft()
+    order.append(c)
+    offset += c.logical_size
+  if section_padding(order, start) < section_padding(parts, start):
+    return order
+  return list(parts)
+
+
+# What the relocation workers share with the parent process.
+_relocation_image = None
+_relocation_work = None
+
+def init_relocation(image, work):
+  """Initialize a worker process of BoldLinker.relocate_parallel().
+  @param image: the shared memory image of the sections to relocate.
+  @param work: the sections to relocate, see relocate_parallel().
+  """
+  global _relocation_image, _relocation_work
+  _relocation_image = image
+  _relocation_work = work
+
+
+def relocate_section(n):
+  """Relocate a section, in a worker process of
+  BoldLinker.relocate_parallel(). The section is read from its slice of the
+  shared image, and written back to it.
+  @param n: the index of the section in the work list.
+  """
+  obj, target, tables, start, size = _relocation_work[n]
+  target.content.data = BinArray(_relocation_image[start:start + size])
+  obj.relocate_section(target, tables)
+  _relocation_image[start:start + size] = target.content.data.tostring()
+
+
 class BoldLinker(object):
   """A Linker object takes one or more objects files, optional shared libs,
   and arranges all this in an executable.
+
+  @cvar elf: the Elf class of the inputs and of the output.
+  @cvar pointer_size: size of the function pointers in .bss.
+  @cvar jump_relocation: relocation type and addend for the jumps to the
+    external functions, when they are called directly.
+  @cvar min_parallel: below this many relocations, starting processes to
+    apply them is not worth it. With numpy, they are much cheaper to apply in
+    a single process.
+  @ivar large_alignment: if set, the COMMON symbols and .bss sections at
+    least that large are aligned on that many bytes, such as a cache line or
+    a page.
   """
+  elf = Elf64
+  pointer_size = 8
+  jump_relocation = (R_X86_64_PC32, -4)
+  min_parallel = 200000 if numpy is None else 2000000
 
   def __init__(self):
     object.__init__(self)
 
     self.objs = []
+    self.archives = []
     self.shlibs = []
     self.entry_point = "_start"
-    self.output = Elf64()
+    self.output = self.elf()
     self.global_symbols = {}
     self.undefined_symbols = set()
     self.common_symbols = set()
+    self.imports = []
+    self.large_alignment = None
+    self.cache = None
+    self.relocation_time = 0
+    self.text_segment = None
+    self.data_segment = None
+    self.text_group_sizes = None
+    self.symbol_ordering = None
+    self.call_graph = None
+    self.code_order = None
+    self.rodata_size = None
+    self.collected = None
+    self.folding = None
+    self.duplicate_groups = [0, 0]
+    self.kept_sections = {}
+    self.merged_strings = None
+    self.merged_constants = None
 
 
   def add_object(self, filename):
     """Add a relocatable file as input.
     @param filename: path to relocatable object file to add
     """
-    obj = Elf64(filename)
+    if self.cache is not None:
+      key = self.cache.key(filename, self.elf.__name__)
+      summary = self.cache.get(key)
+      if summary is not None:
+        obj = self.elf()
+        obj.restore(filename, summary)
+        self.objs.append(obj)
+        return
+
+    obj = self.elf(filename)
     obj.resolve_names()
     obj.find_symbols()
     self.objs.append(obj)
 
+    if self.cache is not None:
+      self.cache.put(key, obj.summary())
+
+
+  def add_objects(self, filenames, jobs=1):
+    """Add several relocatable files as input, parsing them in parallel.
+    The objects are added in the given order, whatever the order in which
+    their parsing is done.
+    @param filenames: paths to relocatable object files to add
+    @param jobs: number of processes to use
+    """
+    if jobs <= 1 or len(filenames) <= 1:
+      for filename in filenames:
+        self.add_object(filename)
+      return
+
+    summaries = [None] * len(filenames)
+    if self.cache is not None:
+      keys = [self.cache.key(f, self.elf.__name__) for f in filenames]
+      summaries = [self.cache.get(key) for key in keys]
+
+    # Only parse what wasn't found in the cache
+    missing = [n for n, summary in enumerate(summaries) if summary is None]
+    if missing:
+      pool = Pool(min(jobs, len(missing)))
+      try:
+        parsed = pool.map(parse_object,
+          [(self.elf, filenames[n]) for n in missing])
+      finally:
+        pool.terminate()
+      for n, summary in zip(missing, parsed):
+        summaries[n] = summary
+        if self.cache is not None:
+          self.cache.put(keys[n], summary)
+
+    for filename, summary in zip(filenames, summaries):
+      obj = self.elf()
+      obj.restore(filename, summary)
+      self.objs.append(obj)
+
+
+  def add_archive(self, filename):
+    """Add a static library as input. Its members are only linked if they
+    define a symbol that would be undefined otherwise.
+    @param filename: path to the ar archive to add
+    """
+    self.archives.append(Archive(filename))
+
+
+  def extract_archive_members(self):
+    """Add the archive members that define undefined symbols, and then the
+    ones needed by these members, and so on until nothing more is found."""
+    defined = set()
+    undefined = set()
+    for i in self.objs:
+      defined.update(i.global_symbols)
+      undefined.update(i.undefined_symbols)
+
+    found = True
+    while found:
+      found = False
+      for archive in self.archives:
+        for name in sorted(undefined - defined):
+          if name in defined:
+            # Brought by a member extracted in this very loop.
+            continue
+          offset = archive.symbols.get(name)
+          if offset is None or offset in archive.extracted:
+            continue
+          obj = archive.load(offset, self.elf)
+          self.objs.append(obj)
+          defined.update(obj.global_symbols)
+          undefined.update(obj.undefined_symbols)
+          found = True
+
+
+  def discard_duplicate_groups(self):
+    """Keep only the first instance of each COMDAT group, such as the C++
+    inline functions and template instances, that several objects define.
+    The sections of the other instances are discarded, along with their
+    relocations and the symbols they define, which are then found in the
+    instance that is kept. The section symbols of the discarded sections,
+    that .eh_frame refers to, stand for the same sections of the instance
+    that is kept (see kept_sections)."""
+    groups = {}
+    for i in self.objs:
+      for sh in i.shdrs:
+        if sh.sh_type != SHT_GROUP or not sh.content.flags & GRP_COMDAT:
+          continue
+        kept = groups.setdefault(sh.content.signature, (i, sh))
+        if kept == (i, sh):
+          continue
+        members = set(i.shdrs[n] for n in sh.content.members)
+        i.discarded.update(members)
+        self.duplicate_groups[0] += 1
+        self.duplicate_groups[1] += sum(s.sh_size for s in members
+          if s.sh_flags & SHF_ALLOC)
+        for name, (section, value) in i.global_symbols.items():
+          if section in members:
+            del i.global_symbols[name]
+
+        obj, group = kept
+        same = dict((obj.shdrs[n].name, obj.shdrs[n])
+          for n in group.content.members)
+        for s in members:
+          # The merged sections move their content around, leave them out.
+          if s.sh_flags & SHF_MERGE or not s.sh_flags & SHF_ALLOC:
+            continue
+          if s.name in same and same[s.name].sh_flags & SHF_ALLOC:
+            self.kept_sections[s] = (obj, same[s.name])
+            i.folded[s] = same[s.name]
+
 
   def build_symbols_tables(self):
     """Find out the globally available symbols, as well as the globally
     undefined ones (which should be found in external libraries."""
 
+    # Pull what's needed out of the static libraries
+    self.extract_archive_members()
+
+    # Only keep the first instance of the COMDAT groups
+    self.discard_duplicate_groups()
+
     # Gather the "extern" and common symbols from each input files.
     for i in self.objs:
       self.undefined_symbols.update(i.undefined_symbols)
@@ -83,6 +518,8 @@ class BoldLinker(object):
     # Add a few useful symbols. They'll be resolved ater as well.
     self.global_symbols["_dt_debug"] = None
     self.global_symbols["_DYNAMIC"] = None
+    # Declared by the objects compiled with -fPIC, even if unused.
+    self.global_symbols["_GLOBAL_OFFSET_TABLE_"] = None
 
     # Find out which symbols aren't really defined anywhere
     self.undefined_symbols.difference_update(self.global_symbols)
@@ -96,6 +533,333 @@ class BoldLinker(object):
         self.common_symbols.remove(i)
 
 
+  def collect_garbage(self):
+    """Leave out the sections that can't be reached from the entry point by
+    following the relocations, with the symbols they define. The external
+    and common symbols only used by these sections are forgotten as well, so
+    that they are not resolved at startup.
+    To be called after build_symbols_tables(), before build_external().
+    """
+    # Where each global symbol is defined, and what each section refers to
+    definitions = {}
+    for i in self.objs:
+      for name, (section, value) in i.global_symbols.iteritems():
+        if section != SHN_ABS:
+          definitions[name] = (i, section)
+    tables = dict((i, dict(i.relocation_targets())) for i in self.objs)
+
+    if self.entry_point not in definitions:
+      raise UndefinedSymbol(self.entry_point)
+    work = [definitions[self.entry_point]]
+    for i in self.objs:
+      for sh in i.shdrs:
+        if sh.sh_flags & SHF_GNU_RETAIN:
+          work.append((i, sh))
+
+    live = set()
+    used = set()    # The undefined and common symbols referenced
+    while work:
+      obj, section = work.pop()
+      if (obj, section) in live:
+        continue
+      live.add((obj, section))
+      for relatab in tables[obj].get(section, []):
+        symtab = relatab.symtab
+        for r_sym in set(tolist(relatab.r_sym)):
+          shndx = symtab.st_shndx[r_sym]
+          defined = SHN_UNDEF < shndx < SHN_LORESERVE
+          if defined and obj.shdrs[shndx] in self.kept_sections:
+            # In a discarded COMDAT group, the kept instance is used
+            work.append(self.kept_sections[obj.shdrs[shndx]])
+          elif defined and obj.shdrs[shndx] not in obj.discarded:
+            work.append((obj, obj.shdrs[shndx]))
+          elif defined or shndx in [SHN_UNDEF, SHN_COMMON]:
+            # Defined elsewhere, or in a discarded COMDAT group
+            name = symtab.names[r_sym]
+            used.add(name)
+            if name in definitions:
+              work.append(definitions[name])
+
+    sections = 0
+    size = 0
+    for i in self.objs:
+      for sh in i.shdrs:
+        if i.is_emitted(sh) and (i, sh) not in live:
+          i.discarded.add(sh)
+          sections += 1
+          size += sh.sh_size
+      for name, (section, value) in i.global_symbols.items():
+        if section in i.discarded:
+          del i.global_symbols[name]
+          del self.global_symbols[name]
+
+    unused = self.undefined_symbols - used
+    self.undefined_symbols -= unused
+    self.common_symbols = set(c for c in self.common_symbols if c[0] in used)
+    self.collected = (sections, size, len(unused))
+
+
+  def fold_identical_code(self, safe=False):
+    """Fold the identical executable sections into a single one. Sections
+    are identical when their content is, and their relocations refer to the
+    same symbols or to identical sections. The symbols of the folded
+    sections then point into the one that is kept, the first in link order.
+    To be called after build_symbols_tables(), before build_external().
+    @param safe: don't fold the sections whose address is taken, as a
+      function pointer might be compared with another one.
+    """
+    definitions = {}
+    for i in self.objs:
+      for name, (section, value) in i.global_symbols.iteritems():
+        if section != SHN_ABS:
+          definitions[name] = ((i, section), value)
+
+    # What the relocations of each section refer to: a section (as an
+    # (object, header) pair) and an offset in it, or a name or an absolute
+    # value for the symbols that are not in a section.
+    references = {}
+    for i in self.objs:
+      for target, tables in i.relocation_targets():
+        refs = []
+        for relatab in tables:
+          symtab = relatab.symtab
+          if relatab.r_addend is None:
+            # The addends are part of the content
+            addends = [0] * len(relatab)
+          else:
+            addends = tolist(relatab.r_addend)
+          for r_offset, r_type, r_sym, r_addend in zip(
+              tolist(relatab.r_offset), tolist(relatab.r_type),
+              tolist(relatab.r_sym), addends):
+            shndx = symtab.st_shndx[r_sym]
+            name = symtab.names[r_sym]
+            defined = SHN_UNDEF < shndx < SHN_LORESERVE
+            if defined and i.shdrs[shndx] not in i.discarded:
+              section = (i, i.shdrs[shndx])
+              value = int(symtab.st_value[r_sym])
+            elif (defined and symtab.local_mask[r_sym] and
+                i.shdrs[shndx] in self.kept_sections):
+              # A section symbol in a discarded COMDAT group
+              section = self.kept_sections[i.shdrs[shndx]]
+              value = int(symtab.st_value[r_sym])
+            elif defined or shndx in [SHN_UNDEF, SHN_COMMON]:
+              section, value = definitions.get(name, (None, name))
+            else:
+              section, value = None, int(symtab.st_value[r_sym])
+            refs.append((r_offset, r_type, r_addend, section, value))
+        references[(i, target)] = refs
+
+    # Sections referred to by anything but a call or a jump
+    taken = set()
+    if safe:
+      for (i, source), refs in references.iteritems():
+        if source.name == ".eh_frame":
+          # Unwind information, it doesn't take any address
+          continue
+        code = source.sh_flags & SHF_EXECINSTR
+        if code:
+          data = tostring(source.content.data)
+        for r_offset, r_type, r_addend, section, value in refs:
+          if section is None:
+            continue
+          if not (code and i.is_branch(data, r_offset, r_type)):
+            taken.add(section)
+
+    candidates = []
+    for i in self.objs:
+      for sh in i.shdrs:
+        if (i.is_emitted(sh) and sh.sh_type == SHT_PROGBITS and
+            sh.sh_flags & SHF_EXECINSTR and (i, sh) not in taken):
+          candidates.append((i, sh))
+
+    # First, tell the sections apart by their own content and relocations,
+    # then by the classes of the sections they refer to, until no class is
+    # split anymore.
+    targets = {}
+    classes = {}
+    ids = {}
+    for s in candidates:
+      refs = references.get(s, [])
+      targets[s] = [r[3] for r in refs if r[3] is not None]
+      key = (s[1].sh_flags, s[1].sh_addralign, tostring(s[1].content.data),
+        tuple((o, t, a, section is None, v) for o, t, a, section, v in refs))
+      ids[s] = classes.setdefault(key, len(classes))
+    count = len(classes)
+    while True:
+      classes = {}
+      refined = {}
+      for s in candidates:
+        key = (ids[s], tuple(ids.get(target, target) for target in targets[s]))
+        refined[s] = classes.setdefault(key, len(classes))
+      ids = refined
+      if len(classes) == count:
+        break
+      count = len(classes)
+
+    sections = 0
+    size = 0
+    survivors = {}
+    for s in candidates:
+      survivor = survivors.setdefault(ids[s], s)
+      if survivor is s:
+        continue
+      i, sh = s
+      i.discarded.add(sh)
+      i.folded[sh] = survivor[1]
+      sections += 1
+      size += sh.sh_size
+    self.folding = (sections, size)
+
+
+  def merge_sections(self):
+    """Merge the SHF_MERGE sections of all the objects into sections without
+    duplicates. In the string sections (SHF_STRINGS, such as .rodata.str1.1),
+    a string that ends another one is not stored again either, see
+    place_strings(). The other ones, such as .rodata.cst8, are pools of
+    constants of sh_entsize bytes, see place_constants(). The symbols and
+    the relocations that point into the sections are moved to the merged
+    entries.
+    """
+    groups = {}
+    order = []
+    for i in self.objs:
+      for sh in i.shdrs:
+        if not i.is_emitted(sh) or sh.sh_type != SHT_PROGBITS:
+          continue
+        if not sh.sh_flags & SHF_MERGE:
+          continue
+        data = tostring(sh.content.data)
+        if sh.sh_flags & SHF_STRINGS:
+          entsize = sh.sh_entsize or 1
+          entries = split_strings(data, entsize)
+        else:
+          entsize = sh.sh_entsize
+          entries = split_constants(data, entsize)
+        if not entries:
+          continue
+        key = (sh.sh_flags, entsize, max(sh.sh_addralign, 1))
+        if key not in groups:
+          groups[key] = []
+          order.append(key)
+        groups[key].append((i, sh, entries))
+    if not order:
+      return
+
+    merged = self.elf()
+    merged.filename = "Merged sections"
+    moved = {}      # The merged sections of each object, with their entries
+    strings = [0, 0, 0]     # Bytes before and after, sections
+    constants = [0, 0, 0, 0]  # Entries before and after, bytes
+    for flags, entsize, align in order:
+      group = groups[(flags, entsize, align)]
+      unique = []
+      for i, sh, entries in group:
+        unique.extend(e for offset, e in entries)
+      if flags & SHF_STRINGS:
+        placed, data = place_strings(set(unique), entsize, align)
+        strings[1] += len(data)
+        strings[2] += 1
+      else:
+        placed, data = place_constants(unique, align)
+        constants[0] += len(unique)
+        constants[1] += len(placed)
+        constants[3] += len(data)
+
+      sh = self.elf.Shdr(len(merged.shdrs))
+      sh.owner = merged
+      sh.name = group[0][1].name
+      sh.sh_type = SHT_PROGBITS
+      sh.sh_flags = flags
+      sh.sh_entsize = entsize
+      sh.sh_addralign = align
+      sh.sh_size = len(data)
+      sh.content = BinArray(data)
+      merged.shdrs.append(sh)
+
+      for i, input, entries in group:
+        i.discarded.add(input)
+        i.folded[input] = sh
+        moved.setdefault(i, {})[input] = ([o for o, e in entries],
+          [placed[e] for o, e in entries])
+        if flags & SHF_STRINGS:
+          strings[0] += input.sh_size
+        else:
+          constants[2] += input.sh_size
+
+    self.objs.append(merged)
+    if strings[2]:
+      self.merged_strings = tuple(strings)
+    if constants[0]:
+      self.merged_constants = tuple(constants)
+
+    for i, sections in moved.iteritems():
+      self.move_to_merged(i, sections)
+
+
+  def move_to_merged(self, obj, sections):
+    """Make the symbols and relocations of an object that point into merged
+    sections point to the merged entries, see merge_sections().
+    @param sections: the entries of each of the merged sections of obj.
+    """
+    indices = [sh.index for sh in sections]
+    # The symbols of the sections, whose relocations locate the entries
+    # with the addend.
+    section_symbols = {}
+    for sh in obj.shdrs:
+      if sh.sh_type != SHT_SYMTAB:
+        continue
+      symtab = sh.content
+      if numpy is not None and isinstance(symtab.st_shndx, numpy.ndarray):
+        mask = numpy.in1d(symtab.st_shndx, indices)
+      else:
+        mask = [shndx in indices for shndx in symtab.st_shndx]
+      st_value = writable(symtab.st_value)
+      for n in select(mask):
+        section = obj.shdrs[int(symtab.st_shndx[n])]
+        if symtab.st_info[n] & 0x0f == STT_SECTION:
+          section_symbols.setdefault(symtab, {})[n] = section
+          continue
+        st_value[n] = merged_offset(sections[section], int(st_value[n]))
+      symtab.st_value = st_value
+
+    for name, (section, value) in obj.global_symbols.items():
+      if section in sections:
+        obj.global_symbols[name] = (section,
+          merged_offset(sections[section], value))
+
+    for target, tables in obj.relocation_targets():
+      for relatab in tables:
+        symbols = section_symbols.get(relatab.symtab)
+        if not symbols:
+          continue
+        if numpy is not None and isinstance(relatab.r_sym, numpy.ndarray):
+          mask = numpy.in1d(relatab.r_sym, symbols.keys())
+        else:
+          mask = [r_sym in symbols for r_sym in relatab.r_sym]
+        entries = select(mask)
+        if not entries:
+          continue
+        if relatab.r_addend is not None:
+          r_addend = writable(relatab.r_addend)
+          for n in entries:
+            strings = sections[symbols[int(relatab.r_sym[n])]]
+            r_addend[n] = merged_offset(strings, int(r_addend[n]))
+          relatab.r_addend = r_addend
+          continue
+        # Implicit addends, found in the relocated fields
+        data = target.content.writable_data()
+        for n in entries:
+          r_type = int(relatab.r_type[n])
+          if r_type not in obj.relocations:
+            # relocate() will complain
+            continue
+          signed = obj.relocations[r_type][1]
+          r_offset = int(relatab.r_offset[n])
+          strings = sections[symbols[int(relatab.r_sym[n])]]
+          addend = signed.unpack_from(data, r_offset)[0]
+          signed.pack_into(data, r_offset, merged_offset(strings, addend))
+
+
   def build_external(self, with_jump=False, align_jump=False):
     """
     Generate a fake relocatable object, for dynamic linking.
@@ -114,36 +878,57 @@ class BoldLinker(object):
       symbols.remove('_bold__functions_hash')
     if '_bold__functions_pointers' in symbols:
       symbols.remove('_bold__functions_pointers')
+    self.imports = symbols
+
+    # The COMMON symbols, by name. One that several objects declare gets the
+    # largest size and alignment.
+    commons = {}
+    for s_name, s_size, s_alignment in self.common_symbols:
+      size, alignment = commons.get(s_name, (0, 1))
+      commons[s_name] = [max(size, s_size), max(alignment, s_alignment)]
+    if self.large_alignment:
+      for c in commons.itervalues():
+        if c[0] >= self.large_alignment:
+          c[1] = max(c[1], self.large_alignment)
+    # The most aligned first, then the smallest, so that little padding is
+    # needed, whatever the order of the objects.
+    commons = sorted(commons.iteritems(),
+      key=lambda (name, (size, alignment)): (-alignment, size, name))
 
     # Create the fake ELF object.
-    fo = Elf64() # Don't care about most parts of ELF header (?)
+    fo = self.elf() # Don't care about most parts of ELF header (?)
     fo.filename = "Internal dynamic linker"
 
     # We need a .data section, a .bss section and a possibly a .text section
-    data_shdr = Elf64_Shdr()
+    data_shdr = self.elf.Shdr()
     data_shdr.sh_type = SHT_PROGBITS
     data_shdr.sh_flags = (SHF_WRITE | SHF_ALLOC)
     data_shdr.sh_size = len(symbols) * 4
+    data_shdr.sh_addralign = 4
     fmt = "<" + "I" * len(symbols)
-    data_shdr.content = BinArray(struct.pack(fmt, *[hash_name(s) for s in symbols]))
+    data_shdr.content = BinArray(struct.pack(fmt,
+      *[hash_name(s) for s in symbols]))
     fo.shdrs.append(data_shdr)
     fo.sections['.data'] = data_shdr
 
-    bss_shdr = Elf64_Shdr()
+    bss_shdr = self.elf.Shdr()
     bss_shdr.sh_type = SHT_NOBITS
     bss_shdr.sh_flags = (SHF_WRITE | SHF_ALLOC)
+    bss_shdr.sh_addralign = max([self.pointer_size] +
+      [s_alignment for s_name, (s_size, s_alignment) in commons])
     bss_shdr.content = BinArray("")
     fo.shdrs.append(bss_shdr)
     fo.sections['.bss'] = bss_shdr
 
     if with_jump:
-      text_shdr = Elf64_Shdr()
+      text_shdr = self.elf.Shdr()
       text_shdr.sh_type = SHT_PROGBITS
       text_shdr.sh_flags = (SHF_ALLOC | SHF_EXECINSTR)
-      text_shdr.sh_size = len(symbols) * 8
+      text_shdr.sh_size = len(symbols) * self.pointer_size
       if align_jump:
         fmt = '\xff\x25\x00\x00\x00\x00\x00\x00' # ff 25 = jmp [rel label]
         jmp_size = 8
+        text_shdr.sh_addralign = 8
       else:
         fmt = '\xff\x25\x00\x00\x00\x00'
         jmp_size = 6
@@ -159,8 +944,8 @@ class BoldLinker(object):
     fo.global_symbols['_bold__functions_pointers'] = (bss_shdr, 0)
 
     # The COMMON symbols. Assign an offset in .bss, declare as global.
-    bss_common_offset = len(symbols) * 8
-    for s_name, s_size, s_alignment in self.common_symbols:
+    bss_common_offset = len(symbols) * self.pointer_size
+    for s_name, (s_size, s_alignment) in commons:
       padding = (s_alignment - (bss_common_offset % s_alignment)) % s_alignment
       bss_common_offset += padding
       fo.global_symbols[s_name] = (bss_shdr, bss_common_offset)
@@ -173,39 +958,39 @@ class BoldLinker(object):
       h = "_bold__hash_%s" % i
       fo.global_symbols[h] = (data_shdr, n * 4) # Section, offset
 
+      # another symbol can be used to reference the pointer, just in case.
+      # It is also the GOT slot of the symbol.
+      p = "_bold__%s" % i
+      fo.global_symbols[p] = (bss_shdr, n * self.pointer_size)
+
       if with_jump:
         # the symbol is in .text, can be called directly
         fo.global_symbols[i] = (text_shdr, n * jmp_size)
-        # another symbol can be used to reference the pointer, just in case.
-        p = "_bold__%s" % i
-        fo.global_symbols[p] = (bss_shdr, n * 8)
 
       else:
         # The symbol is in .bss, must be called indirectly
-        fo.global_symbols[i] = (bss_shdr, n * 8)
+        fo.global_symbols[i] = (bss_shdr, n * self.pointer_size)
 
     if with_jump:
       # Add relocation entries for the jumps
       # Relocation will be done for the .text, for every jmp instruction.
-      class dummy: pass
-      rela_shdr = Elf64_Shdr()
+      rela_shdr = self.elf.Shdr()
       rela_shdr.sh_type = SHT_RELA
       rela_shdr.target = text_shdr
       rela_shdr.sh_flags = 0
-      rela_shdr._content = dummy() # We only need a container for relatab...
-      relatab = []                      # Prepare a relatab
-      rela_shdr.content.relatab = relatab
-
+      rela_shdr.content = None          # An empty relatab, to be filled
+      relatab = rela_shdr.content
+      # Only holds the referenced symbols
+      symtab_shdr = self.elf.Shdr()
+      symtab_shdr.sh_type = SHT_SYMTAB
+      symtab_shdr.content = None
+      relatab.symtab = symtab_shdr.content
+
+      r_type, r_addend = self.jump_relocation
       for n, i in enumerate(symbols):
         # Create a relocation entry for each symbol
-        reloc = dummy()
-        reloc.r_offset = (n * jmp_size) + 2   # Beginning of the cell to update
-        reloc.r_addend = -4
-        reloc.r_type = R_X86_64_PC32
-        reloc.symbol = dummy()
-        reloc.symbol.st_shndx = SHN_UNDEF
-        reloc.symbol.name = "_bold__%s" % i
-        relatab.append(reloc)
+        r_sym = relatab.symtab.append("_bold__%s" % i, SHN_UNDEF)
+        relatab.append((n * jmp_size) + 2, r_type, r_sym, r_addend)
       fo.shdrs.append(rela_shdr)
       fo.sections['.rela.text'] = rela_shdr
 
@@ -242,9 +1027,139 @@ class BoldLinker(object):
         raise UndefinedSymbol(symbol)
 
 
-  def link(self):
-    """Do the actual linking."""
-    # Prepare two segments. One for .text, the other for .data + .bss
+  def relocate_parallel(self, jobs):
+    """Apply the relocations with several processes, each section being
+    relocated by one of them. The sections are copied into an anonymous
+    shared mapping, that the workers relocate in place, each in its own
+    slice. They are then copied back.
+    @param jobs: number of processes to use
+    @return: False if there are too few relocations to bother, or if some
+      are unsupported. Nothing is done then.
+    """
+    work = []
+    offset = 0
+    count = 0
+    for obj in self.objs:
+      for target, tables in obj.relocation_targets():
+        for relatab in tables:
+          if not obj.supports(relatab):
+            # Let the serial relocation report it.
+            return False
+          count += len(relatab)
+        size = len(target.content.data)
+        work.append((obj, target, tables, offset, size))
+        offset += size
+    if count < self.min_parallel or len(work) < 2:
+      return False
+
+    image = mmap.mmap(-1, offset)
+    for obj, target, tables, start, size in work:
+      image[start:start + size] = tostring(target.content.data)
+
+    # The biggest sections first, so that the last ones fill the gaps.
+    order = sorted(range(len(work)), key=lambda n: -work[n][4])
+    # The workers are forked, they inherit the objects, with their resolved
+    # addresses, without pickling them.
+    pool = Pool(min(jobs, len(work)), init_relocation, (image, work))
+    try:
+      pool.map(relocate_section, order, chunksize=1)
+    finally:
+      pool.terminate()
+
+    for obj, target, tables, start, size in work:
+      target.content.data = BinArray(image[start:start + size])
+      obj.applied_relocations += sum(len(relatab) for relatab in tables)
+    image.close()
+    return True
+
+
+  def read_symbol_ordering(self, filename):
+    """Read the symbols whose sections are to be laid out first, in that
+    order, one per line."""
+    self.symbol_ordering = []
+    for line in open(filename):
+      name = line.split("#")[0].strip()
+      if name:
+        self.symbol_ordering.append(name)
+
+
+  def read_call_graph(self, filename):
+    """Read a call graph profile, such as made out of the output of perf
+    script: one "caller callee count" entry per line."""
+    self.call_graph = []
+    for n, line in enumerate(open(filename)):
+      fields = line.split("#")[0].split()
+      if not fields:
+        continue
+      try:
+        caller, callee, count = fields
+        self.call_graph.append((caller, callee, int(count)))
+      except ValueError:
+        raise InvalidProfile(filename, n + 1)
+
+
+  def order_code(self, text):
+    """Pick the code sections that define the symbols of symbol_ordering, in
+    that order, then the other ones in call_graph, as ordered by
+    cluster_sections().
+    @param text: the code sections, in link order.
+    @return: the sections picked, in their order, and the other ones.
+    """
+    position = dict((c, n) for n, c in enumerate(text))
+    where = {}
+    for i in self.objs:
+      for symbols in [i.global_symbols, i.local_symbols]:
+        for name, (section, value) in symbols.iteritems():
+          if section == SHN_ABS:
+            continue
+          content = i.folded.get(section, section).content
+          if content in position:
+            where.setdefault(name, content)
+
+    ordered = []
+    picked = set()
+    missing = set()
+    for name in self.symbol_ordering or []:
+      if name not in where:
+        missing.add(name)
+      elif where[name] not in picked:
+        ordered.append(where[name])
+        picked.add(where[name])
+
+    edges = []
+    for caller, callee, count in self.call_graph or []:
+      missing.update(name for name in [caller, callee] if name not in where)
+      if caller in where and callee in where:
+        edges.append((where[caller], where[callee], count))
+    nodes = set(c for edge in edges for c in edge[:2] if c not in picked)
+    nodes = sorted(nodes, key=position.get)
+    index = dict((c, n) for n, c in enumerate(nodes))
+    order = cluster_sections([c.size for c in nodes],
+      [(index[caller], index[callee], count)
+        for caller, callee, count in edges
+        if caller in index and callee in index])
+    ordered += [nodes[n] for n in order]
+    picked.update(nodes)
+
+    self.code_order = (ordered, edges, len(missing))
+    return ordered, [c for c in text if c not in picked]
+
+
+  def link(self, jobs=1, pack=False):
+    """Do the actual linking.
+    @param jobs: number of processes to apply the relocations with
+    @param pack: reorder the sections to need less padding between them,
+      see pack_sections()
+    """
+    # Relax the GOT loads, or give them a slot, before the sizes are known
+    imports = set(self.imports)
+    for i in self.objs:
+      i.allocate_got(imports)
+
+    # Only keep one copy of each string and constant
+    self.merge_sections()
+
+    # Prepare two segments. One for .text + .rodata, the other for .data + .bss
     self.text_segment = TextSegment()
     # .data will be mapped 0x100000 bytes further
     self.data_segment = DataSegment(align=0x100000)
@@ -252,35 +1167,37 @@ class BoldLinker(object):
     self.output.add_segment(self.data_segment)
 
     # Adjust the ELF header
-    self.output.header.e_ident.make_default_amd64()
+    self.output.header.e_ident.make_default(self.output.elfclass)
     self.output.header.e_phoff = self.output.header.size
     self.output.header.e_type = ET_EXEC
     # Elf header lies inside .text
     self.text_segment.add_content(self.output.header)
 
     # Create the four Program Headers. They'll be inside .text
-    # The first Program Header defines .text
-    ph_text = Elf64_Phdr()
+    # The first Program Header defines .text and .rodata, never written to:
+    # the writable code goes to .data, which stays executable.
+    ph_text = self.elf.Phdr()
     ph_text.p_type = PT_LOAD
+    ph_text.p_flags = PF_R + PF_X
     ph_text.p_align = 0x100000
     self.output.add_phdr(ph_text)
     self.text_segment.add_content(ph_text)
 
     # Second one defines .data + .bss
-    ph_data = Elf64_Phdr()
+    ph_data = self.elf.Phdr()
     ph_data.p_type = PT_LOAD
     ph_data.p_align = 0x100000
     self.output.add_phdr(ph_data)
     self.text_segment.add_content(ph_data)
 
     # Third one is only there to define the DYNAMIC section
-    ph_dynamic = Elf64_Phdr()
+    ph_dynamic = self.elf.Phdr()
     ph_dynamic.p_type = PT_DYNAMIC
     self.output.add_phdr(ph_dynamic)
     self.text_segment.add_content(ph_dynamic)
 
     # Fourth one is for interp
-    ph_interp = Elf64_Phdr()
+    ph_interp = self.elf.Phdr()
     ph_interp.p_type = PT_INTERP
     self.output.add_phdr(ph_interp)
     self.text_segment.add_content(ph_interp)
@@ -289,11 +1206,11 @@ class BoldLinker(object):
     self.output.header.ph_num = len(self.output.phdrs)
 
     # Create the actual content for the interpreter section
-    interp = Interpreter()
+    interp = Interpreter(self.output.interpreter)
     self.text_segment.add_content(interp)
 
     # Then the Dynamic section
-    dynamic = Dynamic()
+    dynamic = Dynamic(self.elf.Dyn)
     # for all the requested libs, add a reference in the Dynamic table
     for lib in self.shlibs:
       dynamic.add_shlib(lib)
@@ -308,24 +1225,72 @@ class BoldLinker(object):
     self.text_segment.add_content(dynamic.strtab)
 
     # We can now add the interesting sections to the corresponding segments
+    text = []
+    rodata = []
+    data = []
+    nobits = []
     for i in self.objs:
       for sh in i.shdrs:
-        # Only ALLOC sections are worth it.
+        # Only ALLOC sections are worth it, unless garbage collected.
         # This might require change in the future
-        if not (sh.sh_flags & SHF_ALLOC):
+        if not i.is_emitted(sh):
           continue
 
-        if (sh.sh_flags & SHF_EXECINSTR):
-          self.text_segment.add_content(sh.content)
-        else: # No exec, it's for .data or .bss
+        if (sh.sh_flags & SHF_EXECINSTR) and not (sh.sh_flags & SHF_WRITE):
+          text.append(sh.content)
+        else: # No exec or writable, it's for .rodata, .data or .bss
           if (sh.sh_type == SHT_NOBITS):
-            self.data_segment.add_nobits(sh.content)
+            nobits.append(sh.content)
+          elif not (sh.sh_flags & SHF_WRITE):
+            # Read-only, it follows the code so that its pages stay clean
+            # and are shared between the processes.
+            rodata.append(sh.content)
           else:
-            self.data_segment.add_content(sh.content)
+            data.append(sh.content)
+
+    # .bss, the most aligned first, then the smallest
+    if self.large_alignment:
+      for c in nobits:
+        if c.logical_size >= self.large_alignment:
+          c.header.sh_addralign = max(c.alignment, self.large_alignment)
+    nobits.sort(key=lambda c: (-c.alignment, c.logical_size))
+
+    # The code in the profile first, if any. Then the code executed at startup,
+    # the hot code, the normal code, and the code unlikely to be executed.
+    ordered = []
+    if self.symbol_ordering is not None or self.call_graph is not None:
+      ordered, text = self.order_code(text)
+    groups = [[] for group in text_groups]
+    for c in text:
+      groups[text_group(c)].append(c)
+    self.text_group_sizes = [sum(c.size for c in g) for g in groups]
+    self.rodata_size = sum(c.size for c in rodata)
+
+    # Packing starts where the segment ends so far, at the address that
+    # output.layout() will give it.
+    base_vaddr = 0x400000
+    text_start = base_vaddr + self.text_segment.align
+    for c in ordered:
+      self.text_segment.add_content(c)
+    for parts in groups + [rodata]:
+      if pack:
+        parts = pack_sections(parts, self.text_segment.end(text_start))
+      for c in parts:
+        self.text_segment.add_content(c)
+
+    data_start = self.text_segment.end(text_start) + self.data_segment.align
+    if pack:
+      data = pack_sections(data, self.data_segment.end(data_start))
+    for c in data:
+      self.data_segment.add_content(c)
+    if pack:
+      nobits = pack_sections(nobits, self.data_segment.end(data_start))
+    for c in nobits:
+      self.data_segment.add_nobits(c)
 
     # Now, everything is at its place.
     # Knowing the base address, we can determine where everyone will fall
-    self.output.layout(base_vaddr=0x400000)
+    self.output.layout(base_vaddr=base_vaddr)
 
     # Knowing the addresses of all the parts, Program Headers can be filled
     # This will put the correct p_offset, p_vaddr, p_filesz and p_memsz
@@ -334,6 +1299,16 @@ class BoldLinker(object):
     ph_interp.update_from_content(interp)
     ph_dynamic.update_from_content(dynamic)
 
+    # The folded sections are where the sections replacing them are. The
+    # instance kept of a COMDAT group may have been folded in turn.
+    folded = {}
+    for i in self.objs:
+      folded.update(i.folded)
+    for sh, survivor in folded.iteritems():
+      while survivor in folded:
+        survivor = folded[survivor]
+      sh.content.virt_addr = getattr(survivor.content, 'virt_addr', None)
+
     # All parts are at their final address, find out the symbols' addresses
     for i in self.objs:
       for s in i.global_symbols:
@@ -349,10 +1324,19 @@ class BoldLinker(object):
     # Resolve the few useful symbols
     self.global_symbols["_dt_debug"] = dynamic.dt_debug_address
     self.global_symbols["_DYNAMIC"] = dynamic.virt_addr
+    # There is no single GOT, none of the supported relocations use it.
+    self.global_symbols["_GLOBAL_OFFSET_TABLE_"] = self.data_segment.virt_addr
 
-    # We can now do the actual relocation
+    # Every object can now find out the final address of its symbols
     for i in self.objs:
-      i.apply_relocation(self.global_symbols)
+      i.resolve_addresses(self.global_symbols)
+
+    # We can now do the actual relocation
+    start = time.time()
+    if jobs <= 1 or not self.relocate_parallel(jobs):
+      for i in self.objs:
+        i.apply_relocation(self.global_symbols)
+    self.relocation_time = time.time() - start
 
     # And update the ELF header with the entry point
     if not self.entry_point in self.global_symbols:
@@ -362,6 +1346,80 @@ class BoldLinker(object):
     # DONE !
 
 
+  def statistics(self):
+    """Describe what was left out or optimized during the link.
+    @return: a list of lines of text.
+    """
+    skipped_bytes = sum(i.skipped_bytes for i in self.objs)
+    skipped_relocations = sum(i.skipped_relocations for i in self.objs)
+    lines = []
+    lines.append("Sections not emitted: %d bytes and %d relocations skipped" %
+      (skipped_bytes, skipped_relocations))
+    if self.duplicate_groups[0]:
+      lines.append("COMDAT groups: %d duplicates discarded, %d bytes" %
+        tuple(self.duplicate_groups))
+    if self.collected is not None:
+      lines.append("Garbage collection: %d sections, %d bytes and "
+        "%d imports removed" % self.collected)
+    if self.folding is not None:
+      lines.append("Identical code folding: %d sections folded, "
+        "%d bytes saved" % self.folding)
+    if self.merged_strings is not None:
+      lines.append("String merging: %d bytes of strings merged into %d, "
+        "in %d sections" % self.merged_strings)
+    if self.merged_constants is not None:
+      lines.append("Constant merging: %d entries merged into %d, "
+        "%d bytes into %d" % self.merged_constants)
+    if self.text_group_sizes is not None:
+      lines.append("Code: " + ", ".join("%d bytes %s" % (size, group)
+        for size, (group, prefix) in zip(self.text_group_sizes, text_groups)))
+    if self.code_order is not None:
+      ordered, edges, missing = self.code_order
+      # The pages, hence i-TLB entries, that the profiled code needs
+      pages = set()
+      size = 0
+      for c in ordered:
+        size += c.size
+        pages.update(xrange(c.virt_addr // page_size,
+          (c.virt_addr + max(c.size, 1) - 1) // page_size + 1))
+      line = ("Code ordering: %d sections, %d bytes on %d pages "
+        "(at least %d)" % (len(ordered), size, len(pages),
+          (size + page_size - 1) // page_size))
+      calls = sum(count for caller, callee, count in edges)
+      if calls:
+        near = sum(count for caller, callee, count in edges
+          if caller.virt_addr // page_size == callee.virt_addr // page_size)
+        line += ", %d%% of the calls within a page" % (100 * near // calls)
+      if missing:
+        line += ", %d symbols not found" % missing
+      lines.append(line)
+    if self.rodata_size is not None:
+      lines.append("Read-only data: %d bytes in the text segment" %
+        self.rodata_size)
+    if self.text_segment is not None:
+      padding = (sum(self.text_segment.padding) +
+        sum(self.data_segment.padding) + sum(self.data_segment.nobits_padding))
+      lines.append("Alignment: %d bytes of padding" % padding)
+    applied = sum(i.applied_relocations for i in self.objs)
+    rate = applied / max(self.relocation_time, 1e-6)
+    lines.append("Relocations: %d applied in %.3fs (%d per second)" %
+      (applied, self.relocation_time, rate))
+    relaxed = sum(i.relaxed_loads for i in self.objs)
+    import_loads = sum(i.import_loads for i in self.objs)
+    slots = sum(len(i.got.content.data) for i in self.objs if i.got)
+    if relaxed or import_loads or slots:
+      lines.append("GOT: %d loads relaxed, %d from import pointers, "
+        "%d bytes of slots" % (relaxed, import_loads, slots))
+    if self.archives:
+      lines.append("Archives: %d of %d members extracted" %
+        (sum(len(a.extracted) for a in self.archives),
+         sum(len(a.members) for a in self.archives)))
+    if self.cache is not None:
+      lines.append("Object cache: %d hits, %d misses" %
+        (self.cache.hits, self.cache.misses))
+    return lines
+
+
   def toBinArray(self):
     return self.output.toBinArray()
 
@@ -369,3 +1427,9 @@ class BoldLinker(object):
   def tofile(self, file_object):
     return self.output.toBinArray().tofile(file_object)
 
+
+class BoldLinker32(BoldLinker):
+  """The same linker, for i386 objects."""
+  elf = Elf32
+  pointer_size = 4
+  jump_relocation = (R_386_32, 0)
@@ -0,0 +1,10 @@
+// Shared by both objects: g++ puts the inline function and the template
+// instance in COMDAT groups, that the unwind tables of .eh_frame refer to.
+
+extern "C" long write(int fd, const void *buf, unsigned long count);
+
+inline int twice(int x) { return x * 2; }
+
+template <class T> T add(T a, T b) { return a + b; }
+
+int one();
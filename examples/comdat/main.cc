@@ -0,0 +1,9 @@
+#include "comdat.h"
+
+extern "C" int main()
+{
+  if (twice(add<int>(3, 4)) + one() != 20)
+    return 1;
+  write(1, "comdat ok\n", 10);
+  return 0;
+}
@@ -0,0 +1,6 @@
+#include "comdat.h"
+
+int one()
+{
+  return twice(add<int>(1, 2));
+}